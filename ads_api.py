@@ -0,0 +1,143 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from photos import PHOTOS_SQL
+from publish_queue import db_timestamp
+
+
+# Поля, які можна запросити через /ads?fields=...
+ADS_FIELDS = (
+    "id", "user_id", "username", "first_name", "category", "district", "title", "description",
+    "photos", "contacts", "is_published", "is_rejected", "rejection_reason", "is_queued",
+    "shares", "created_at",
+)
+
+STATUS_FILTERS = {
+    "published": "is_published=1",
+    "rejected": "is_rejected=1",
+    # черга — таблиця publish_queue (оголошення з неї прибираються при публікації і відхиленні)
+    "queued": "id IN (SELECT ad_id FROM publish_queue)",
+    "pending": "is_queued=0 AND is_published=0 AND is_rejected=0",
+}
+
+# Поля, які обчислюються, а не беруться зі стовпця ads
+FIELD_SQL = {"photos": f"{PHOTOS_SQL} AS photos"}
+
+STREAM_CHUNK = 500
+
+
+# -------------------------------
+# 🔹 Курсор
+# -------------------------------
+# Курсор — (created_at, id) останнього рядка сторінки, закодований у base64url
+def encode_cursor(created_at: str, ad_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{ad_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, ad_id = raw.rsplit("|", 1)
+    return created_at, int(ad_id)
+
+
+# -------------------------------
+# 🔹 Запит
+# -------------------------------
+class AdsQuery:
+    """
+    Вибірка оголошень для API: фільтри, проєкція полів і keyset-пагінація
+    по (created_at, id) від новіших до старіших. Кожна сторінка — окремий
+    короткий запит, тож з'єднання не утримується між сторінками.
+    """
+
+    def __init__(self, fields: str | None = None, status: str | None = None,
+                 category: str | None = None, district: str | None = None,
+                 user_id: int | None = None, date_from: str | None = None, date_to: str | None = None,
+                 cursor: str | None = None):
+        if fields:
+            requested = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in requested if f not in ADS_FIELDS]
+            if unknown:
+                raise ValueError(f"Невідомі поля: {', '.join(unknown)}")
+        else:
+            requested = list(ADS_FIELDS)
+        if status and status not in STATUS_FILTERS:
+            raise ValueError(f"Невідомий статус: {status}")
+        self.fields = requested
+        # id і created_at потрібні для курсора, навіть якщо їх не просили
+        self.columns = list(dict.fromkeys(requested + ["created_at", "id"]))
+
+        where, params = [], []
+        if status:
+            where.append(STATUS_FILTERS[status])
+        if category:
+            where.append("category=?")
+            params.append(category)
+        if district:
+            where.append("district=?")
+            params.append(district)
+        if user_id is not None:
+            where.append("user_id=?")
+            params.append(user_id)
+        # діапазони дат — напряму по created_at, щоб працював індекс
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(db_timestamp(datetime.fromisoformat(date_from)))
+        if date_to:
+            where.append("created_at < ?")
+            params.append(db_timestamp(datetime.fromisoformat(date_to) + timedelta(days=1)))
+        self.where = where
+        self.params = params
+        self.after = decode_cursor(cursor) if cursor else None
+
+    def _sql(self, after: tuple[str, int] | None, limit: int) -> tuple[str, list]:
+        where, params = list(self.where), list(self.params)
+        if after is not None:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        sql = f"SELECT {', '.join(FIELD_SQL.get(c, c) for c in self.columns)} FROM ads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    def _project(self, row: tuple) -> dict:
+        return {c: v for c, v in zip(self.columns, row) if c in self.fields}
+
+    async def page(self, db, limit: int) -> tuple[list[dict], str | None]:
+        """Одна сторінка і курсор наступної (None — сторінок більше немає)."""
+        sql, params = self._sql(self.after, limit + 1)
+        rows = await db.fetchall(sql, params)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = dict(zip(self.columns, rows[-1]))
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return [self._project(r) for r in rows], next_cursor
+
+    async def iter_rows(self, db, chunk: int = STREAM_CHUNK):
+        """Всі рядки вибірки порціями по chunk — пам'ять не залежить від розміру таблиці."""
+        after = self.after
+        created_idx, id_idx = self.columns.index("created_at"), self.columns.index("id")
+        while True:
+            sql, params = self._sql(after, chunk)
+            rows = await db.fetchall(sql, params)
+            for row in rows:
+                yield self._project(row)
+            if len(rows) < chunk:
+                return
+            after = (rows[-1][created_idx], rows[-1][id_idx])
+
+    async def stream_ndjson(self, db):
+        async for item in self.iter_rows(db):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    async def stream_json(self, db):
+        yield "["
+        first = True
+        async for item in self.iter_rows(db):
+            yield ("" if first else ",") + json.dumps(item, ensure_ascii=False)
+            first = False
+        yield "]"
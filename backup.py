@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import logging
+import os
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from migrations import LATEST_VERSION, apply_migrations
+
+
+CHUNK_SIZE = 256 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _gzip():
+    # wbits=31 — формат gzip
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+# -------------------------------
+# 🔹 Резервні копії
+# -------------------------------
+class BackupManager:
+    """
+    Резервні копії бази без зупинки бота: знімок робиться онлайн-бекапом
+    SQLite у тимчасовий файл, далі стискається в gzip частинами в окремому
+    потоці. Якщо задано interval, за розкладом зберігаються локальні копії
+    в directory (задача в спільному scheduler бота), з них лишається keep
+    найновіших. Відновлення перевіряє завантажений файл, доводить його
+    схему до LATEST_VERSION і лише тоді переносить у живу базу через
+    Database.restore().
+    """
+
+    def __init__(self, db, scheduler: AsyncIOScheduler, directory: str = "backups",
+                 keep: int = 7, interval: int = 0):
+        self.db = db
+        self.directory = Path(directory)
+        self.keep = keep
+        self.interval = interval
+        self.scheduler = scheduler
+        self._restore_lock = asyncio.Lock()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self.scheduler.add_job(self.snapshot, "interval", seconds=self.interval,
+                               max_instances=1, coalesce=True, id="backup")
+        logging.info(f"💾 Резервні копії: кожні {self.interval} с, зберігається {self.keep}")
+
+    async def take(self) -> str:
+        """Знімок бази у тимчасовий файл; повертає шлях до нього."""
+        fd, path = tempfile.mkstemp(suffix=".db", dir=self.directory if self.directory.is_dir() else None)
+        os.close(fd)
+        try:
+            await self.db.backup(path)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    async def stream(self, path: str):
+        """
+        Знімок з take(), стиснутий gzip, частинами — для StreamingResponse.
+        Після передачі (або обриву) тимчасовий файл видаляється.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            with open(path, "rb") as f:
+                compressor = _gzip()
+                while True:
+                    chunk = await loop.run_in_executor(None, f.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    data = await loop.run_in_executor(None, compressor.compress, chunk)
+                    if data:
+                        yield data
+                yield compressor.flush()
+        finally:
+            os.remove(path)
+
+    def _compress_to(self, src: str, dest: Path):
+        tmp = dest.with_suffix(dest.suffix + ".part")
+        compressor = _gzip()
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            while chunk := fin.read(CHUNK_SIZE):
+                fout.write(compressor.compress(chunk))
+            fout.write(compressor.flush())
+        os.replace(tmp, dest)
+
+    def _rotate(self):
+        snapshots = sorted(self.directory.glob("bot-*.db.gz"))
+        for old in snapshots[:-self.keep] if self.keep > 0 else []:
+            old.unlink()
+
+    async def snapshot(self) -> Path:
+        """Зберігає стиснуту копію в directory і видаляє зайві старі."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        dest = self.directory / f"bot-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db.gz"
+        path = await self.take()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._compress_to, path, dest)
+        finally:
+            os.remove(path)
+        await loop.run_in_executor(None, self._rotate)
+        logging.info(f"💾 Збережено резервну копію {dest}")
+        return dest
+
+    # --- відновлення ---
+    async def _receive(self, upload, path: str):
+        """Пише завантаження на диск частинами; gzip розпаковується на льоту."""
+        loop = asyncio.get_running_loop()
+        decompressor = None
+        with open(path, "wb") as f:
+            first = True
+            while chunk := await upload.read(CHUNK_SIZE):
+                if first:
+                    first = False
+                    if chunk[:2] == GZIP_MAGIC:
+                        decompressor = zlib.decompressobj(31)
+                if decompressor is not None:
+                    chunk = await loop.run_in_executor(None, decompressor.decompress, chunk)
+                await loop.run_in_executor(None, f.write, chunk)
+            if decompressor is not None:
+                f.write(decompressor.flush())
+                if not decompressor.eof:
+                    raise ValueError("архів gzip обрізаний")
+
+    def _check(self, path: str, page_size: int) -> int:
+        """Перевіряє цілісність і версію схеми, мігрує копію; повертає початкову версію."""
+        try:
+            conn = sqlite3.connect(path)
+        except sqlite3.Error as e:
+            raise ValueError(f"файл не є базою SQLite: {e}")
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != "ok":
+                raise ValueError(f"пошкоджена база: {result}")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > LATEST_VERSION:
+                raise ValueError(f"версія схеми {version} новіша за підтримувану {LATEST_VERSION}")
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='ads'").fetchone():
+                raise ValueError("у базі немає таблиці ads")
+            # у живу базу потрапляє лише копія з актуальною схемою
+            try:
+                apply_migrations(conn.cursor())
+            except Exception as e:
+                raise ValueError(f"не вдалося оновити схему з версії {version}: {e}")
+            # бекап у базу в режимі WAL можливий лише при однаковому розмірі сторінки
+            conn.execute("PRAGMA journal_mode=DELETE")
+            if conn.execute("PRAGMA page_size").fetchone()[0] != page_size:
+                conn.execute(f"PRAGMA page_size={int(page_size)}")
+                conn.execute("VACUUM")
+            return version
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"файл не є базою SQLite: {e}")
+        finally:
+            conn.close()
+
+    async def restore(self, upload, pause=None) -> int:
+        """
+        Відновлює базу із завантаженого файлу (.db або .db.gz).
+        Некоректний файл — ValueError, жива база при цьому не змінюється.
+        pause() — async context manager, під яким виконується саме копіювання
+        (зупиняє тих, хто пише в базу).
+        """
+        async with self._restore_lock:
+            fd, path = tempfile.mkstemp(suffix=".db", dir=self.directory if self.directory.is_dir() else None)
+            os.close(fd)
+            loop = asyncio.get_running_loop()
+            try:
+                await self._receive(upload, path)
+                page_size = (await self.db.fetchone("PRAGMA page_size"))[0]
+                version = await loop.run_in_executor(None, self._check, path, page_size)
+                async with pause() if pause else contextlib.nullcontext():
+                    await self.db.restore(path)
+                return version
+            except zlib.error as e:
+                raise ValueError(f"пошкоджений gzip: {e}")
+            finally:
+                os.remove(path)
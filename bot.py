@@ -1,13 +1,14 @@
 from fastapi import FastAPI, Request, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
-import shutil
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
+import logging
+from contextlib import asynccontextmanager
 import os
 import re
-import sqlite3
-from datetime import datetime, timedelta
+from html import escape
+from datetime import date, datetime
 from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.types import (
     ReplyKeyboardMarkup,
@@ -15,13 +16,38 @@ from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     InlineQuery,
-    InlineQueryResultArticle,
-    InputTextMessageContent
 )
 import uvicorn
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 from pathlib import Path
 
+from db import Database
+from migrations import migrate
+from categories import CategoryRegistry
+from content_filter import ContentFilter
+from fsm_storage import SQLiteStorage
+from sender import OutboundSender, PRIORITY_MODERATION
+from scheduler import AutopostEngine
+from publish_queue import PublishQueue
+from counters import ShareCounter
+from search import AdSearch
+from ads_api import AdsQuery
+from logs_view import LogFacets, LogsQuery, stream_logs_page
+from stats import StatsStore, window_start
+from backup import BackupManager
+from updates import UpdateWorkers
+from dedupe import UpdateDedupe
+from photos import save_photos, find_reused
+from duplicates import DuplicateIndex
+from user_gate import UserGate, UserGateMiddleware
+from routing import (
+    Router, pack, PUBLISH, QUEUE, REJECT, REJECT_REASON, BLACKLIST, UNBLACKLIST, MY_AD, MY_ADS_PAGE,
+)
+from render import (
+    AdRenderer, Ad, send_payload, render_my_ads_page,
+    MAIN_MENU_KB, SUBMIT_MENU_KB, SUBMIT_ONLY_KB,
+)
+
 # Завантажуємо .env з тієї ж директорії, де bot.py
 env_path = Path(__file__).parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -33,10 +59,33 @@ WEBHOOK_HOST = os.getenv("WEBHOOK_HOST")
 WEBHOOK_PATH = "/webhook"
 WEBHOOK_URL = f"{WEBHOOK_HOST}{WEBHOOK_PATH}"
 DB_PATH = "bot.db"
+DB_READ_POOL = int(os.getenv("DB_READ_POOL", 4))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 5))
+FSM_TTL = int(os.getenv("FSM_TTL", 2 * 24 * 3600))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+SEND_GROUP_RATE_PER_MIN = float(os.getenv("SEND_GROUP_RATE_PER_MIN", 20))
+AUTOPOST_INTERVAL = int(os.getenv("AUTOPOST_INTERVAL", 3600))
+AUTOPOST_BATCH = int(os.getenv("AUTOPOST_BATCH", 10))
+AUTOPOST_MIN_SPACING = int(os.getenv("AUTOPOST_MIN_SPACING", 0))
+SHARES_FLUSH_INTERVAL = float(os.getenv("SHARES_FLUSH_INTERVAL", 10))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", 60))
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", 7))
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", 0))
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_DEDUPE_TTL = int(os.getenv("UPDATE_DEDUPE_TTL", 3600))
+UPDATE_DEDUPE_SIZE = int(os.getenv("UPDATE_DEDUPE_SIZE", 100000))
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.7))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", 30))
+AUTO_REJECT_DUPLICATES = os.getenv("AUTO_REJECT_DUPLICATES", "0") == "1"
 MODERATORS_CHAT_ID = os.getenv("MODERATORS_CHAT_ID")
 if not MODERATORS_CHAT_ID:
     raise ValueError("❌ MODERATORS_CHAT_ID не знайдено у .env")
 MODERATORS_CHAT_ID = int(MODERATORS_CHAT_ID)
+PUBLISH_CHAT_ID = int(os.getenv("PUBLISH_CHAT_ID"))
 
 DISTRICTS = os.getenv("DISTRICTS", "Центр,Лівий берег,Правий берег").split(",")
 
@@ -47,79 +96,38 @@ for item in FAQ_RAW.split(";"):
         q, a = item.split("|", 1)
         FAQ_ITEMS.append((q.strip(), a.strip()))
 
-bot = Bot(token=TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
-app = FastAPI()
-
 # -------------------------------
 # 🔹 База даних
 # -------------------------------
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER UNIQUE,
-    accepted_rules BOOLEAN
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS ads (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    username TEXT,
-    first_name TEXT,
-    category TEXT,
-    district TEXT,
-    title TEXT,
-    description TEXT,
-    photos TEXT,
-    contacts TEXT,
-    is_published INTEGER DEFAULT 0,
-    is_rejected INTEGER DEFAULT 0,
-    is_queued INTEGER DEFAULT 0,
-    rejection_reason TEXT,
-    moder_message_id INTEGER,
-    shares INTEGER DEFAULT 0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS threads (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    chat_id INTEGER,
-    thread_id INTEGER,
-    title TEXT,
-    UNIQUE(chat_id, thread_id)
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS admin_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    admin_id INTEGER,
-    admin_username TEXT,
-    action TEXT,
-    ad_id INTEGER,
-    chat_id INTEGER,
-    thread_id INTEGER,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-""")
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS blacklist (
-    user_id INTEGER PRIMARY KEY,
-    username TEXT,
-    first_name TEXT,
-    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-""")
+db = Database(DB_PATH, read_pool_size=DB_READ_POOL, busy_timeout_ms=DB_BUSY_TIMEOUT_MS)
+categories = CategoryRegistry(db)
 
-conn.commit()
+bot = Bot(token=TOKEN)
+storage = SQLiteStorage(db, flush_interval=FSM_FLUSH_INTERVAL, ttl=FSM_TTL)
+dp = Dispatcher(bot, storage=storage)
+# кнопки клавіатур і callback-дії — через словники Router
+router = Router()
+router.setup(dp)
+sender = OutboundSender(bot, global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE,
+                        group_rate_per_min=SEND_GROUP_RATE_PER_MIN)
+publish_queue = PublishQueue(db, min_spacing=AUTOPOST_MIN_SPACING)
+renderer = AdRenderer(db)
+share_counter = ShareCounter(db, flush_interval=SHARES_FLUSH_INTERVAL)
+ad_search = AdSearch(db, renderer, ttl=INLINE_CACHE_TIME)
+log_facets = LogFacets(db)
+stats_store = StatsStore(db)
+# один планувальник для автопостингу і резервних копій
+scheduler = AsyncIOScheduler()
+backups = BackupManager(db, scheduler, BACKUP_DIR, keep=BACKUP_KEEP, interval=BACKUP_INTERVAL)
+update_workers = UpdateWorkers(dp, bot, workers=UPDATE_WORKERS, queue_size=UPDATE_QUEUE_SIZE)
+update_dedupe = UpdateDedupe(db, ttl=UPDATE_DEDUPE_TTL, max_size=UPDATE_DEDUPE_SIZE)
+user_gate = UserGate(db)
+user_gate_middleware = UserGateMiddleware(user_gate, sender, exempt_chats=[MODERATORS_CHAT_ID])
+dp.middleware.setup(user_gate_middleware)
+duplicates = DuplicateIndex(db, threshold=DUPLICATE_THRESHOLD, window_days=DUPLICATE_WINDOW_DAYS)
+autopost = AutopostEngine(db, sender, categories, publish_queue, renderer, PUBLISH_CHAT_ID, scheduler,
+                          interval=AUTOPOST_INTERVAL, batch_size=AUTOPOST_BATCH)
+app = FastAPI()
 
 # -------------------------------
 # 🔹 FSM
@@ -135,25 +143,28 @@ class AdForm(StatesGroup):
 # -------------------------------
 # 🔹 Фільтр тексту
 # -------------------------------
-BANNED_WORDS = os.getenv("BANNED_WORDS", "").split(",")
-BANNED_WORDS = [w.strip().lower() for w in BANNED_WORDS if w.strip()]
+def parse_banned_words(raw: str | None) -> list[str]:
+    return [w.strip().lower() for w in (raw or "").split(",") if w.strip()]
+
+BANNED_WORDS = parse_banned_words(os.getenv("BANNED_WORDS"))
+# Додатковий список (одне слово на рядок) підхоплюється без перезапуску
+BANNED_WORDS_FILE = os.getenv("BANNED_WORDS_FILE")
+content_filter = ContentFilter(BANNED_WORDS, words_file=BANNED_WORDS_FILE)
+LINK_RE = re.compile(r"(http[s]?://|www\.|t\.me/)", re.IGNORECASE)
 
 def validate_input(text: str) -> tuple[bool, str]:
-    if re.search(r"(http[s]?://|www\.|t\.me/)", text, re.IGNORECASE):
+    if LINK_RE.search(text):
         return False, "❌ Текст не може містити посилання!"
-    lowered = text.lower()
-    for word in BANNED_WORDS:
-        if word in lowered:
-            return False, f"❌ Текст містить заборонене слово: {word}"
+    word = content_filter.find(text)
+    if word:
+        return False, f"❌ Текст містить заборонене слово: {word}"
     return True, ""
 
 # -------------------------------
 # 🔹 Клавіатури
 # -------------------------------
 def main_menu_kb():
-    kb = ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add("📢 Подати оголошення", "ℹ️ FAQ","📋 Мої оголошення")
-    return kb
+    return MAIN_MENU_KB
 
 def faq_text():
     if not FAQ_ITEMS:
@@ -163,108 +174,133 @@ def faq_text():
         lines.append(f"❓ {q}\n💬 {a}")
     return "\n\n".join(lines)
 
-def get_moder_keyboard(ad_id: int, user_id: int, username: str | None):
-    kb = InlineKeyboardMarkup(row_width=2)
-    
-    kb.add(
-        InlineKeyboardButton("✅ Опублікувати зараз", callback_data=f"publish_{ad_id}"),
-        InlineKeyboardButton("⏳ Додати в чергу", callback_data=f"queue_{ad_id}"),
-        InlineKeyboardButton("❌ Відхилити", callback_data=f"reject_{ad_id}"),
-        InlineKeyboardButton("🚫 Чорний список", callback_data=f"blacklist_{ad_id}")
-    )
-    if username:
-        kb.add(InlineKeyboardButton(f"👤 @{username}", url=f"https://t.me/{username}"))
-    else:
-        kb.add(InlineKeyboardButton("👤 Профіль", url=f"tg://user?id={user_id}"))
+_category_kb_cache = {}
+
+def category_kb():
+    # Клавіатура категорій перебудовується лише після зміни прив'язок гілок
+    kb = _category_kb_cache.get(categories.version)
+    if kb is None:
+        kb = ReplyKeyboardMarkup(resize_keyboard=True)
+        for c in categories.titles(MODERATORS_CHAT_ID):
+            kb.add(c)
+        kb.add("ℹ️ FAQ")
+        _category_kb_cache.clear()
+        _category_kb_cache[categories.version] = kb
     return kb
 
-def get_user_button(user_id: int, username: str | None):
-    if username:
-        return InlineKeyboardButton(f"👤 @{username}", url=f"https://t.me/{username}")
-    else:
-        return InlineKeyboardButton("👤 Профіль", url=f"tg://user?id={user_id}")
-
 # -------------------------------
 # 🔹 /start
 # -------------------------------
 @dp.message_handler(commands="start")
 async def cmd_start(message: types.Message):
-    cursor.execute("SELECT accepted_rules FROM users WHERE user_id = ?", (message.from_user.id,))
-    user = cursor.fetchone()
-
-    if user and user[0]:
-        await message.answer("✅ Ви вже погодились з правилами!", reply_markup=main_menu_kb())
+    if user_gate.accepted(message.from_user.id):
+        await sender.reply(message, "✅ Ви вже погодились з правилами!", reply_markup=main_menu_kb())
         return
 
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add("✅ Погоджуюсь", "❌ Не погоджуюсь")
-    await message.answer(
+    await sender.reply(message,
         "📜 Правила:\n1. Без посилань.\n2. Без спаму.\n3. Заборонені слова не допускаються.\n\nВи погоджуєтесь?",
         reply_markup=kb
     )
 
-@dp.message_handler(lambda msg: msg.text in ["✅ Погоджуюсь", "❌ Не погоджуюсь"])
+@router.text("✅ Погоджуюсь", "❌ Не погоджуюсь")
 async def rules_answer(message: types.Message):
     if message.text == "✅ Погоджуюсь":
-        cursor.execute(
-            "INSERT OR REPLACE INTO users (user_id, accepted_rules) VALUES (?, ?)",
-            (message.from_user.id, True)
-        )
-        conn.commit()
-        await message.answer("✅ Дякуємо! Тепер можете подати оголошення:", reply_markup=main_menu_kb())
+        await user_gate.accept(message.from_user.id)
+        await sender.reply(message, "✅ Дякуємо! Тепер можете подати оголошення:", reply_markup=main_menu_kb())
     else:
-        await message.answer("👋 Добре, до зустрічі!", reply_markup=ReplyKeyboardRemove())
+        await sender.reply(message, "👋 Добре, до зустрічі!", reply_markup=ReplyKeyboardRemove())
 
 # -------------------------------
 # 🔹 FAQ
 # -------------------------------
-@dp.message_handler(lambda msg: msg.text == "ℹ️ FAQ")
+@router.text("ℹ️ FAQ")
 async def handle_faq(message: types.Message):
-    await message.answer(faq_text(), reply_markup=main_menu_kb())
+    await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
+
+# -------------------------------
+# 🔹 Мої оголошення
+# -------------------------------
+MY_ADS_PAGE_SIZE = 10
 
-@dp.message_handler(lambda m: m.text == "📋 Мої оголошення")
+async def fetch_my_ads_page(user_id: int, after_id: int | None = None, before_id: int | None = None):
+    """
+    Keyset-пагінація по індексу ads(user_id, created_at): від новіших до старіших.
+    after_id — наступна (старіша) сторінка після цього оголошення,
+    before_id — попередня (новіша) сторінка перед ним.
+    Повертає (rows, has_prev, has_next).
+    """
+    columns = "id, title, is_published, is_rejected"
+    limit = MY_ADS_PAGE_SIZE + 1
+    if before_id is not None:
+        rows = await db.fetchall(f"""
+            SELECT {columns} FROM ads
+            WHERE user_id=? AND (created_at, id) > (SELECT created_at, id FROM ads WHERE id=?)
+            ORDER BY created_at ASC, id ASC LIMIT ?
+        """, (user_id, before_id, limit))
+        has_prev = len(rows) > MY_ADS_PAGE_SIZE
+        return list(reversed(rows[:MY_ADS_PAGE_SIZE])), has_prev, True
+
+    if after_id is not None:
+        rows = await db.fetchall(f"""
+            SELECT {columns} FROM ads
+            WHERE user_id=? AND (created_at, id) < (SELECT created_at, id FROM ads WHERE id=?)
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, (user_id, after_id, limit))
+    else:
+        rows = await db.fetchall(f"""
+            SELECT {columns} FROM ads
+            WHERE user_id=?
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, (user_id, limit))
+    return rows[:MY_ADS_PAGE_SIZE], after_id is not None, len(rows) > MY_ADS_PAGE_SIZE
+
+@router.text("📋 Мої оголошення")
 async def my_ads(message: types.Message):
-    cursor.execute("SELECT id, title, description, contacts, category, district, photos, is_published, is_rejected, is_queued FROM ads WHERE user_id=?", (message.from_user.id,))
-    ads = cursor.fetchall()
+    rows, has_prev, has_next = await fetch_my_ads_page(message.from_user.id)
 
-    if not ads:
-        await message.answer("У вас ще немає оголошень 📝", reply_markup=main_menu_kb())
+    if not rows:
+        await sender.reply(message, "У вас ще немає оголошень 📝", reply_markup=main_menu_kb())
         return
 
-    for ad in ads:
-        ad_id, title, description, contacts, category, district, photos, is_published, is_rejected, is_queued = ad
-        
-        if is_published:
-            status = "опубліковано"
-        elif is_rejected:
-            status = "відхилено"
-        else:
-            status = "в черзі"
-        
-        ad_text = (
-            f"📢 ОГОЛОШЕННЯ #{ad_id}\n\n"
-            f"🔹 Категорія: {category}\n"
-            f"📍 Район: {district}\n"
-            f"🏷 Заголовок: {title}\n"
-            f"📝 Опис: {description}\n"
-            f"📞 Контакти: {contacts}\n"
-            f"Статус: {status}\n"
-        )
+    text, kb = render_my_ads_page(rows, has_prev, has_next)
+    await sender.reply(message, text, reply_markup=kb)
 
-        # Якщо є фото — показуємо перше
-        if photos:
-            first_photo = photos.split(",")[0]
-            try:
-                await bot.send_photo(message.chat.id, first_photo, caption=ad_text, parse_mode="HTML")
-            except:
-                await message.answer(ad_text, parse_mode="HTML")
-        else:
-            await message.answer(ad_text, parse_mode="HTML")
+@router.callback(MY_ADS_PAGE, str, int)
+async def my_ads_page(callback_query: types.CallbackQuery, direction: str, ad_id: int):
+    if direction == "next":
+        rows, has_prev, has_next = await fetch_my_ads_page(callback_query.from_user.id, after_id=ad_id)
+    else:
+        rows, has_prev, has_next = await fetch_my_ads_page(callback_query.from_user.id, before_id=ad_id)
+
+    if not rows:
+        await sender.answer_callback(callback_query, "Більше оголошень немає")
+        return
+
+    text, kb = render_my_ads_page(rows, has_prev, has_next)
+    await sender.edit_text(callback_query.message, text, reply_markup=kb)
+    await sender.answer_callback(callback_query)
+
+@router.callback(MY_AD, int)
+async def my_ad_detail(callback_query: types.CallbackQuery, ad_id: int):
+    ad = await renderer.get_ad(ad_id)
+    if not ad or ad.user_id != callback_query.from_user.id:
+        await sender.answer_callback(callback_query, "Оголошення не знайдено ❌", show_alert=True)
+        return
+
+    payload = renderer.owner(ad)
+    try:
+        await send_payload(sender, callback_query.message.chat.id, payload)
+    except Exception:
+        # Якщо фото недоступне — показуємо лише текст
+        await sender.send_message(callback_query.message.chat.id, payload.text, parse_mode=payload.parse_mode)
+    await sender.answer_callback(callback_query)
 
 # -------------------------------
 # 🔹 Обробник кнопки "Подати оголошення"
 # -------------------------------
-@dp.message_handler(lambda msg: msg.text == "📢 Подати оголошення")
+@router.text("📢 Подати оголошення")
 async def handle_new_ad_button(message: types.Message, state: FSMContext):
     await cmd_create(message, state)
 
@@ -272,33 +308,22 @@ async def handle_new_ad_button(message: types.Message, state: FSMContext):
 # 🔹 /create (FSM) — тепер викликається тільки через кнопку
 # -------------------------------
 async def cmd_create(message: types.Message, state: FSMContext):
-    cursor.execute("SELECT 1 FROM blacklist WHERE user_id=?", (message.from_user.id,))
-    if cursor.fetchone():
-        await message.answer("🚫 Ви заблоковані та не можете подавати оголошення.")
-        return
-    cursor.execute("SELECT accepted_rules FROM users WHERE user_id = ?", (message.from_user.id,))
-    user = cursor.fetchone()
-    if not user or not user[0]:
-        await message.answer("⚠️ Спершу потрібно погодитись із правилами! Натисніть /start")
+    # заблокованих відсіює UserGateMiddleware
+    if not user_gate.accepted(message.from_user.id):
+        await sender.reply(message, "⚠️ Спершу потрібно погодитись із правилами! Натисніть /start")
         return
 
-    cursor.execute("SELECT title FROM threads WHERE chat_id=?", (int(os.getenv("MODERATORS_CHAT_ID")),))
-    categories = [row[0] for row in cursor.fetchall()]
-    if not categories:
-        await message.answer("⚠️ Немає доступних категорій. Спробуйте пізніше")
+    if not categories.titles(MODERATORS_CHAT_ID):
+        await sender.reply(message, "⚠️ Немає доступних категорій. Спробуйте пізніше")
         return
 
     await AdForm.category.set()
-    kb = ReplyKeyboardMarkup(resize_keyboard=True)
-    for c in categories:
-        kb.add(c)
-    kb.add("ℹ️ FAQ")
-    await message.answer("Оберіть категорію:", reply_markup=kb)
+    await sender.reply(message, "Оберіть категорію:", reply_markup=category_kb())
 
 @dp.message_handler(state=AdForm.category)
 async def process_category(message: types.Message, state: FSMContext):
     if message.text == "ℹ️ FAQ":
-        await message.answer(faq_text(), reply_markup=main_menu_kb())
+        await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
         return
     await state.update_data(category=message.text)
     await AdForm.next()
@@ -306,80 +331,84 @@ async def process_category(message: types.Message, state: FSMContext):
     for d in DISTRICTS:
         kb.add(d)
     kb.add("ℹ️ FAQ")
-    await message.answer("Оберіть район:", reply_markup=kb)
+    await sender.reply(message, "Оберіть район:", reply_markup=kb)
 
 @dp.message_handler(state=AdForm.district)
 async def process_district(message: types.Message, state: FSMContext):
     if message.text == "ℹ️ FAQ":
-        await message.answer(faq_text(), reply_markup=main_menu_kb())
+        await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
         return
     await state.update_data(district=message.text)
     await AdForm.next()
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add("ℹ️ FAQ")
-    await message.answer("Введіть заголовок (до 200 символів):", reply_markup=kb)
+    await sender.reply(message, "Введіть заголовок (до 200 символів):", reply_markup=kb)
 
 @dp.message_handler(state=AdForm.title)
 async def process_title(message: types.Message, state: FSMContext):
     if message.text == "ℹ️ FAQ":
-        await message.answer(faq_text(), reply_markup=main_menu_kb())
+        await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
         return
     if len(message.text) > 200:
-        await message.answer("❌ Заголовок занадто довгий (макс 200 символів)")
+        await sender.reply(message, "❌ Заголовок занадто довгий (макс 200 символів)")
         return
     valid, error = validate_input(message.text)
     if not valid:
-        await message.answer(error)
+        await sender.reply(message, error)
         return
     await state.update_data(title=message.text)
     await AdForm.next()
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add("ℹ️ FAQ")
-    await message.answer("Введіть опис (до 2000 символів):", reply_markup=kb)
+    await sender.reply(message, "Введіть опис (до 2000 символів):", reply_markup=kb)
 
 @dp.message_handler(state=AdForm.description)
 async def process_description(message: types.Message, state: FSMContext):
     if message.text == "ℹ️ FAQ":
-        await message.answer(faq_text(), reply_markup=main_menu_kb())
+        await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
         return
     if len(message.text) > 2000:
-        await message.answer("❌ Опис занадто довгий (макс 2000 символів)")
+        await sender.reply(message, "❌ Опис занадто довгий (макс 2000 символів)")
         return
     valid, error = validate_input(message.text)
     if not valid:
-        await message.answer(error)
+        await sender.reply(message, error)
         return
     await state.update_data(description=message.text)
     await AdForm.next()
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add("Пропустити", "ℹ️ FAQ")
-    await message.answer("Надішліть фото (до 20 шт). Якщо без фото — натисніть «Пропустити».", reply_markup=kb)
+    await sender.reply(message, "Надішліть фото (до 20 шт). Якщо без фото — натисніть «Пропустити».", reply_markup=kb)
+
+def photos_from_state(data: dict) -> dict[str, str]:
+    """Фото з форми: {file_unique_id: file_id} у порядку додавання."""
+    photos_data = data.get("photos_data", {})
+    if isinstance(photos_data, list):
+        # форма, розпочата до оновлення, зберігала список словників
+        photos_data = {p["unique_id"]: p["file_id"] for p in photos_data}
+    return photos_data
 
 @dp.message_handler(content_types=["photo", "text"], state=AdForm.photos)
 async def process_photos(message: types.Message, state: FSMContext):
     # Отримуємо поточні дані зі стану
     data = await state.get_data()
-    photos_data = data.get("photos_data", [])  # список словників {file_id, unique_id}
+    photos_data = photos_from_state(data)
 
     # Якщо користувач натиснув FAQ
     if message.text == "ℹ️ FAQ":
-        await message.answer(faq_text(), reply_markup=main_menu_kb())
+        await sender.reply(message, faq_text(), reply_markup=main_menu_kb())
         return
 
     # Якщо користувач натиснув "Пропустити" або "Готово"
     if message.content_type == "text":
         if message.text.lower() in ["пропустити", "готово"]:
-            # Формуємо рядок з file_id (для збереження у БД)
-            photos_str = ",".join([p["file_id"] for p in photos_data])
-            await state.update_data(photos=photos_str)
-
             await AdForm.next()
             kb = ReplyKeyboardMarkup(resize_keyboard=True)
             kb.add("ℹ️ FAQ")
-            await message.answer("Введіть контактну інформацію (до 200 символів):", reply_markup=kb)
+            await sender.reply(message, "Введіть контактну інформацію (до 200 символів):", reply_markup=kb)
             return
         else:
-            await message.answer("❌ Надішліть фото або натисніть «Готово» / «Пропустити».")
+            await sender.reply(message, "❌ Надішліть фото або натисніть «Готово» / «Пропустити».")
             return
 
     # Якщо користувач надсилає фото
@@ -388,39 +417,71 @@ async def process_photos(message: types.Message, state: FSMContext):
         unique_id = message.photo[-1].file_unique_id
 
         # Перевірка на дубль
-        if unique_id not in [p["unique_id"] for p in photos_data]:
-            photos_data.append({"file_id": file_id, "unique_id": unique_id})
+        if unique_id not in photos_data:
+            photos_data[unique_id] = file_id
             await state.update_data(photos_data=photos_data)
 
             kb = ReplyKeyboardMarkup(resize_keyboard=True)
             kb.add("Готово", "Пропустити", "ℹ️ FAQ")
-            await message.answer(
+            await sender.reply(message,
                 f"Фото додано ✅ Всього фото: {len(photos_data)}. Якщо все — натисніть «Готово».",
                 reply_markup=kb
             )
         else:
-            await message.answer("⚠️ Це фото вже було додано раніше.")
+            await sender.reply(message, "⚠️ Це фото вже було додано раніше.")
 
 @dp.message_handler(state=AdForm.contacts)
 async def process_contacts(message: types.Message, state: FSMContext):
     if len(message.text) > 200:
-        await message.answer("❌ Контакти занадто довгі (макс 200 символів)")
+        await sender.reply(message, "❌ Контакти занадто довгі (макс 200 символів)")
         return
     valid, error = validate_input(message.text)
     if not valid:
-        await message.answer(error)
+        await sender.reply(message, error)
         return
 
     await state.update_data(contacts=message.text)
     data = await state.get_data()
-    photos = data.get("photos", "")
-    cursor.execute("""
-        INSERT INTO ads (
-            user_id, username, first_name, category, district, title, description, photos, contacts,
-            is_published, is_rejected, rejection_reason, shares
+    photos_data = photos_from_state(data)
+
+    # схожі оголошення — до вставки, щоб нове не знайшло саме себе
+    sig, exact = await duplicates.fingerprint(data["title"], data["description"])
+    exact_ids, near = duplicates.check(sig, exact)
+    own_repeats = [ad_id for ad_id, user_id, _ in near if ad_id in exact_ids and user_id == message.from_user.id]
+    if AUTO_REJECT_DUPLICATES and own_repeats:
+        await state.finish()
+        await sender.reply(message,
+            f"❌ Таке оголошення вже подано (#{own_repeats[0]}). Повторно воно не надсилається.",
+            reply_markup=SUBMIT_MENU_KB
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, NULL, 0)
-    """, (
+        return
+
+    def insert(cur):
+        cur.execute("""
+            INSERT INTO ads (
+                user_id, username, first_name, category, district, title, description, contacts,
+                is_published, is_rejected, rejection_reason, shares
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 0, NULL, 0)
+        """, (
+            message.from_user.id,
+            message.from_user.username,
+            message.from_user.first_name,
+            data["category"],
+            data["district"],
+            data["title"],
+            data["description"],
+            data["contacts"]
+        ))
+        ad_id = cur.lastrowid
+        save_photos(cur, ad_id, photos_data)
+        duplicates.save(cur, ad_id, sig, exact)
+        return ad_id
+    ad_id = await db.transaction(insert)
+    duplicates.add(ad_id, message.from_user.id, sig, exact)
+
+    ad = Ad(
+        ad_id,
         message.from_user.id,
         message.from_user.username,
         message.from_user.first_name,
@@ -428,109 +489,69 @@ async def process_contacts(message: types.Message, state: FSMContext):
         data["district"],
         data["title"],
         data["description"],
-        data.get("photos", ""),
-        data["contacts"]
-    ))
-    conn.commit()
-
-    cursor.execute("SELECT last_insert_rowid()")
-    ad_id = cursor.fetchone()[0]
-
-    moder_text = (
-        f"📢 НОВЕ ОГОЛОШЕННЯ #{ad_id}\n\n"
-        f"👤 Користувач: {message.from_user.first_name or ''} "
-        f"(@{message.from_user.username}) [ID: {message.from_user.id}]\n\n"
-        f"🔹 Категорія: {data['category']}\n"
-        f"📍 Район: {data['district']}\n"
-        f"🏷 Заголовок: {data['title']}\n"
-        f"📝 Опис: {data['description']}\n"
-        f"📞 Контакти: {data['contacts']}\n"
+        ",".join(photos_data.values()),
+        data["contacts"],
     )
 
-    kb = get_moder_keyboard(ad_id, message.from_user.id, message.from_user.username)
-
     # Шукаємо гілку для модерації
-    cursor.execute("""
-        SELECT chat_id, thread_id FROM threads
-        WHERE title=? AND chat_id=?
-    """, (data["category"], int(os.getenv("MODERATORS_CHAT_ID"))))
-    row = cursor.fetchone()
+    moder_chat_id = MODERATORS_CHAT_ID
+    moder_thread_id = categories.thread_id(moder_chat_id, data["category"])
 
-    if not row:
-        kb = ReplyKeyboardMarkup(resize_keyboard=True).add(
-            "📢 Подати оголошення", "📋 Мої оголошення"
-        )
-        await bot.send_message(user_id, "❌ Щось пішло не так. Спробуйте пізніше", reply_markup=kb)
+    if moder_thread_id is None:
+        await sender.send_message(message.from_user.id, "❌ Щось пішло не так. Спробуйте пізніше", reply_markup=SUBMIT_MENU_KB)
         return
 
-    moder_chat_id, moder_thread_id = row
+    payload = renderer.moder(ad)
+    if near:
+        lines = []
+        for other_id, user_id, score in near[:5]:
+            kind = "повтор" if other_id in exact_ids else f"схожість {score:.0%}"
+            author = "той самий автор" if user_id == message.from_user.id else "інший автор"
+            lines.append(f"• #{other_id} — {kind}, {author}")
+        payload = payload._replace(text=payload.text + "\n\n⚠️ Схожі оголошення:\n" + "\n".join(lines))
+
+    msg = await send_payload(sender, moder_chat_id, payload, moder_thread_id, PRIORITY_MODERATION)
+    await db.execute("UPDATE ads SET moder_message_id=? WHERE id=?", (msg.message_id, ad_id))
+
+    # автору — лише коли оголошення справді дійшло до модераторів
+    await sender.send_message(message.from_user.id, "✅ Ваше оголошення збережено та передано на модерацію!",
+                              reply_markup=ReplyKeyboardRemove())
+    await state.finish()
 
-    if photos:
-        photos = photos.split(",")
-        if len(photos) == 1:
-            msg = await bot.send_photo(
-                chat_id=moder_chat_id,
-                message_thread_id=moder_thread_id,
-                photo=photos[0],
-                caption=moder_text,
-                reply_markup=kb
-            )
-        else:
-            media = [types.InputMediaPhoto(p) for p in photos[:10]]
-            await bot.send_media_group(
-                chat_id=moder_chat_id,
-                message_thread_id=moder_thread_id,
-                media=media
-            )
-            msg = await bot.send_message(
-                chat_id=moder_chat_id,
-                message_thread_id=moder_thread_id,
-                text=moder_text,
-                reply_markup=kb
-            )
-    else:
-        msg = await bot.send_message(
-            chat_id=moder_chat_id,
-            message_thread_id=moder_thread_id,
-            text=moder_text,
-            reply_markup=kb
+    # ті самі фото вже були в оголошеннях інших користувачів — підказка модераторам
+    reused = await find_reused(db, photos_data.keys(), message.from_user.id)
+    if reused:
+        await sender.send_message(
+            moder_chat_id,
+            f"⚠️ Фото з оголошення #{ad_id} вже використовувались в: " + ", ".join(f"#{i}" for i in reused),
+            message_thread_id=moder_thread_id, priority=PRIORITY_MODERATION
         )
 
-    cursor.execute("UPDATE ads SET moder_message_id=? WHERE id=?", (msg.message_id, ad_id))
-    conn.commit()
-
-    await message.answer("✅ Ваше оголошення збережено та передано на модерацію!", reply_markup=ReplyKeyboardRemove())
-    await state.finish()
-
 # -------------------------------
 # 🔹 Модерація
 # -------------------------------
-def log_admin_action(admin_id, username, action, ad_id=None, chat_id=None, thread_id=None):
-    cursor.execute(
+async def log_admin_action(admin_id, username, action, ad_id=None, chat_id=None, thread_id=None):
+    await db.execute(
         "INSERT INTO admin_logs (admin_id, admin_username, action, ad_id, chat_id, thread_id) VALUES (?, ?, ?, ?, ?, ?)",
         (admin_id, username, action, ad_id, chat_id, thread_id)
     )
-    conn.commit()
 
-@dp.callback_query_handler(lambda c: c.data.startswith("reject_"))
-async def process_reject(callback_query: types.CallbackQuery):
-    ad_id = int(callback_query.data.split("_")[1])
+@router.callback(REJECT, int)
+async def process_reject(callback_query: types.CallbackQuery, ad_id: int):
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(
-        InlineKeyboardButton("❌ Заборонені слова", callback_data=f"reason_banned_{ad_id}"),
-        InlineKeyboardButton("❌ Є посилання", callback_data=f"reason_link_{ad_id}"),
-        InlineKeyboardButton("❌ Недостатньо інформації", callback_data=f"reason_info_{ad_id}")
+        InlineKeyboardButton("❌ Заборонені слова", callback_data=pack(REJECT_REASON, "banned", ad_id)),
+        InlineKeyboardButton("❌ Є посилання", callback_data=pack(REJECT_REASON, "link", ad_id)),
+        InlineKeyboardButton("❌ Недостатньо інформації", callback_data=pack(REJECT_REASON, "info", ad_id))
     )
-    await callback_query.message.answer(
+    await sender.reply(callback_query.message,
         f"Виберіть причину відхилення для оголошення #{ad_id}:",
         reply_markup=kb
     )
-    await callback_query.answer()
+    await sender.answer_callback(callback_query)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("reason_"))
-async def process_reject_reason(callback_query: types.CallbackQuery):
-    parts = callback_query.data.split("_")
-    reason_type, ad_id = parts[1], int(parts[2])
+@router.callback(REJECT_REASON, str, int)
+async def process_reject_reason(callback_query: types.CallbackQuery, reason_type: str, ad_id: int):
     reasons = {
         "banned": "Містить заборонені слова",
         "link": "Є посилання",
@@ -538,152 +559,96 @@ async def process_reject_reason(callback_query: types.CallbackQuery):
     }
     reason = reasons.get(reason_type, "Відхилено")
 
-    cursor.execute("UPDATE ads SET is_rejected=1, rejection_reason=? WHERE id=?", (reason, ad_id))
-    conn.commit()
+    await db.execute("UPDATE ads SET is_rejected=1, rejection_reason=? WHERE id=?", (reason, ad_id))
+    await publish_queue.remove(ad_id)
+    renderer.invalidate(ad_id)
 
-    cursor.execute("SELECT user_id FROM ads WHERE id=?", (ad_id,))
-    user_id = cursor.fetchone()[0]
+    user_id = (await db.fetchone("SELECT user_id FROM ads WHERE id=?", (ad_id,)))[0]
 
-    kb = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення", "ℹ️ FAQ","📋 Мої оголошення")
-
-    await bot.send_message(
+    await sender.send_message(
         user_id,
         f"❌ Ваше оголошення #{ad_id} було відхилено.\nПричина: {reason}",
-        reply_markup=kb
+        reply_markup=MAIN_MENU_KB
     )
-    await callback_query.message.answer(f"✅ Оголошення #{ad_id} відхилено. Причина: {reason}")
-    await callback_query.answer()
-    log_admin_action(callback_query.from_user.id, callback_query.from_user.username, f"reject: {reason}", ad_id)
+    await sender.reply(callback_query.message, f"✅ Оголошення #{ad_id} відхилено. Причина: {reason}")
+    await sender.answer_callback(callback_query)
+    await log_admin_action(callback_query.from_user.id, callback_query.from_user.username, f"reject: {reason}", ad_id)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("publish_"))
-async def process_publish(callback_query: types.CallbackQuery):
-    ad_id = int(callback_query.data.split("_")[1])
-    cursor.execute("SELECT user_id, username, first_name, category, district, title, description, photos, contacts FROM ads WHERE id=?", (ad_id,))
-    ad = cursor.fetchone()
+@router.callback(PUBLISH, int)
+async def process_publish(callback_query: types.CallbackQuery, ad_id: int):
+    ad = await renderer.get_ad(ad_id)
 
     if not ad:
-        await callback_query.answer("Оголошення не знайдено ❌", show_alert=True)
+        await sender.answer_callback(callback_query, "Оголошення не знайдено ❌", show_alert=True)
         return
 
-    user_id, username, first_name, category, district, title, description, photos, contacts = ad
-    cursor.execute("UPDATE ads SET is_published=1 WHERE id=?", (ad_id,))
-    conn.commit()
-
-    pub_text = (
-        f"📢 ОГОЛОШЕННЯ #{ad_id}\n\n"
-        f"👤 Користувач: {first_name or ''} (@{username})\n\n"
-        f"🔹 Категорія: {category}\n"
-        f"📍 Район: {district}\n"
-        f"🏷 Заголовок: {title}\n"
-        f"📝 Опис: {description}\n"
-        f"📞 Контакти: {contacts}\n"
-    )
-    pub_kb = InlineKeyboardMarkup()
-    pub_kb.add(get_user_button(user_id, username))
-    pub_kb.add(InlineKeyboardButton("🔗 Поділитися", switch_inline_query=str(ad_id)))
-
-    # шукаємо thread_id і chat_id
-    cursor.execute("SELECT thread_id FROM threads WHERE chat_id=? AND title=?", (int(os.getenv("PUBLISH_CHAT_ID")), category))
-    row = cursor.fetchone()
-    if not row:
-        await callback_query.answer("❌ Категорія не привʼязана до гілки у групі публікацій", show_alert=True)
-        return
-
-    chat_id = int(os.getenv("PUBLISH_CHAT_ID"))
-    thread_id = row[0]
-
-    if photos:
-        photos = photos.split(",")
-        if len(photos) == 1:
-            await bot.send_photo(
-                chat_id=chat_id,
-                message_thread_id=thread_id,
-                photo=photos[0],
-                caption=pub_text,
-                reply_markup=pub_kb
-            )
+    # Спільний шлях публікації з автопостингом: гілка, відправка, статус, сповіщення
+    thread_id = await autopost.publish(ad)
+    if thread_id is None:
+        if categories.thread_id(PUBLISH_CHAT_ID, ad.category) is None:
+            text = "❌ Категорія не привʼязана до гілки у групі публікацій"
         else:
-            media = [types.InputMediaPhoto(p) for p in photos[:10]]
-            await bot.send_media_group(chat_id=chat_id, message_thread_id=thread_id, media=media)
-            await bot.send_message(
-                chat_id=chat_id,
-                message_thread_id=thread_id,
-                text=pub_text,
-                reply_markup=pub_kb
-            )
-    else:
-        await bot.send_message(
-            chat_id=chat_id,
-            message_thread_id=thread_id,
-            text=pub_text,
-            reply_markup=pub_kb
-        )
+            text = "Оголошення вже опубліковане або відхилене"
+        await sender.answer_callback(callback_query, text, show_alert=True)
+        return
+    chat_id = PUBLISH_CHAT_ID
 
-    kb = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення","📋 Мої оголошення")
-    await bot.send_message(user_id, "✅ Ваше оголошення успішно опубліковане!", reply_markup=kb)
-    await callback_query.answer("Оголошення опубліковане ✅")
-    log_admin_action(callback_query.from_user.id, callback_query.from_user.username, "publish", ad_id, chat_id, thread_id)
+    await sender.answer_callback(callback_query, "Оголошення опубліковане ✅")
+    await log_admin_action(callback_query.from_user.id, callback_query.from_user.username, "publish", ad_id, chat_id, thread_id)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("queue_"))
-async def process_queue(callback_query: types.CallbackQuery):
-    ad_id = int(callback_query.data.split("_")[1])
-    cursor.execute("UPDATE ads SET is_queued=1 WHERE id=?", (ad_id,))
-    conn.commit()
+@router.callback(QUEUE, int)
+async def process_queue(callback_query: types.CallbackQuery, ad_id: int):
+    row = await db.fetchone("SELECT user_id, category FROM ads WHERE id=?", (ad_id,))
+    if row:
+        await publish_queue.enqueue(ad_id, row[1])
+        renderer.invalidate(ad_id)
 
-    await callback_query.message.edit_reply_markup(reply_markup=None)
-    cursor.execute("SELECT user_id FROM ads WHERE id=?", (ad_id,))
-    row = cursor.fetchone()
+    await sender.edit_reply_markup(callback_query.message, reply_markup=None)
     if row:
         user_id = row[0]
-        kb = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення")
-        await bot.send_message(user_id, "✅ Ваше оголошення додано до черги на публікацію!", reply_markup=kb)
+        await sender.send_message(user_id, "✅ Ваше оголошення додано до черги на публікацію!", reply_markup=SUBMIT_ONLY_KB)
 
-    log_admin_action(callback_query.from_user.id, callback_query.from_user.username, "queue_ad", ad_id)
+    await log_admin_action(callback_query.from_user.id, callback_query.from_user.username, "queue_ad", ad_id)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("blacklist_"))
-async def process_blacklist(callback_query: types.CallbackQuery):
-    ad_id = int(callback_query.data.split("_")[1])
+@router.callback(BLACKLIST, int)
+async def process_blacklist(callback_query: types.CallbackQuery, ad_id: int):
 
     # Отримуємо користувача з БД
-    cursor.execute("SELECT user_id, username, first_name FROM ads WHERE id=?", (ad_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT user_id, username, first_name FROM ads WHERE id=?", (ad_id,))
 
     if not row:
-        await callback_query.answer("Оголошення не знайдено ❌", show_alert=True)
+        await sender.answer_callback(callback_query, "Оголошення не знайдено ❌", show_alert=True)
         return
 
     user_id, username, first_name = row
 
     # Додаємо у blacklist
-    cursor.execute("INSERT OR IGNORE INTO blacklist (user_id, username, first_name) VALUES (?, ?, ?)",
-                   (user_id, username, first_name))
-    conn.commit()
+    await user_gate.block(user_id, username, first_name)
 
-    await callback_query.answer("🚫 Користувач доданий у чорний список")
-    await bot.send_message(callback_query.from_user.id,
-                           f"Користувач {first_name} (@{username}) [{user_id}] доданий у чорний список")
+    await sender.answer_callback(callback_query, "🚫 Користувач доданий у чорний список")
+    await sender.send_message(callback_query.from_user.id,
+                              f"Користувач {first_name} (@{username}) [{user_id}] доданий у чорний список")
 
     # Логування дії
-    log_admin_action(callback_query.from_user.id,
-                     callback_query.from_user.username,
-                     "blacklist_user",
-                     ad_id)
+    await log_admin_action(callback_query.from_user.id,
+                           callback_query.from_user.username,
+                           "blacklist_user",
+                           ad_id)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("unblacklist_"))
-async def process_unblacklist(callback_query: types.CallbackQuery):
-    user_id = int(callback_query.data.split("_")[1])
+@router.callback(UNBLACKLIST, int)
+async def process_unblacklist(callback_query: types.CallbackQuery, user_id: int):
 
-    cursor.execute("DELETE FROM blacklist WHERE user_id=?", (user_id,))
-    conn.commit()
+    await user_gate.unblock(user_id)
+    user_gate_middleware.forget(user_id)
 
-    await callback_query.answer("✅ Користувача розблоковано")
-    await callback_query.message.edit_text(f"Користувача <code>{user_id}</code> розблоковано", parse_mode="HTML")
+    await sender.answer_callback(callback_query, "✅ Користувача розблоковано")
+    await sender.edit_text(callback_query.message, f"Користувача <code>{user_id}</code> розблоковано", parse_mode="HTML")
 
     # Логування
-    log_admin_action(callback_query.from_user.id,
-                     callback_query.from_user.username,
-                     "unblacklist_user",
-                     None)
+    await log_admin_action(callback_query.from_user.id,
+                           callback_query.from_user.username,
+                           "unblacklist_user",
+                           None)
 
 
 # -------------------------------
@@ -692,36 +657,25 @@ async def process_unblacklist(callback_query: types.CallbackQuery):
 @dp.inline_handler()
 async def inline_query_handler(inline_query: InlineQuery):
     query = inline_query.query.strip()
+    if not query:
+        return
+
     if not query.isdigit():
+        # Пошук опублікованих оголошень за словами
+        results, next_offset = await ad_search.search(query, inline_query.offset)
+        await bot.answer_inline_query(inline_query.id, results=results,
+                                      cache_time=INLINE_CACHE_TIME, next_offset=next_offset)
         return
 
     ad_id = int(query)
-    cursor.execute("SELECT title, description, contacts FROM ads WHERE id=?", (ad_id,))
-    ad = cursor.fetchone()
+    ad = await renderer.get_ad(ad_id)
     if not ad:
         return
 
-    title, description, contacts = ad
-
-    text = (
-        f"📢 ОГОЛОШЕННЯ #{ad_id}\n\n"
-        f"🏷 {title}\n"
-        f"📝 {description}\n"
-        f"📞 {contacts}\n"
-    )
-
-    result = InlineQueryResultArticle(
-        id=str(ad_id),
-        title=f"Поділитися оголошенням #{ad_id}",
-        description=title,
-        input_message_content=InputTextMessageContent(text)
-    )
-
-    await bot.answer_inline_query(inline_query.id, results=[result], cache_time=0)
+    await bot.answer_inline_query(inline_query.id, results=[renderer.inline(ad)], cache_time=INLINE_CACHE_TIME)
 
-    # Рахуємо поширення
-    cursor.execute("UPDATE ads SET shares = shares + 1 WHERE id=?", (ad_id,))
-    conn.commit()
+    # Рахуємо поширення (зберігаються в базу пакетами)
+    share_counter.add(ad_id)
 
 # -------------------------------
 # 🔹 Команда /bindthread
@@ -729,39 +683,33 @@ async def inline_query_handler(inline_query: InlineQuery):
 @dp.message_handler(commands=["bindthread"], chat_type=[types.ChatType.SUPERGROUP])
 async def bind_thread(message: types.Message):
     if not message.is_topic_message:
-        await message.reply("⚠️ Використовуйте цю команду тільки в гілці (форум-темі).")
+        await sender.reply(message, "⚠️ Використовуйте цю команду тільки в гілці (форум-темі).", quote=True)
         return
     args = message.get_args()
     if not args:
-        await message.reply("❌ Ви не вказали назву.\nПриклад: `/bindthread Продаж тварин`", parse_mode="Markdown")
+        await sender.reply(message, "❌ Ви не вказали назву.\nПриклад: `/bindthread Продаж тварин`", parse_mode="Markdown", quote=True)
         return
 
     chat_id = message.chat.id
     thread_id = message.message_thread_id
     title = args.strip()
 
-    cursor.execute("""
-        INSERT INTO threads (chat_id, thread_id, title)
-        VALUES (?, ?, ?)
-        ON CONFLICT(chat_id, thread_id) DO UPDATE SET title=excluded.title
-    """, (chat_id, thread_id, title))
-    conn.commit()
+    await categories.bind(chat_id, thread_id, title)
 
-    await message.reply(f"✅ Гілку збережено як: *{title}*", parse_mode="Markdown")
-    log_admin_action(message.from_user.id, message.from_user.username, "bind_thread", chat_id=chat_id, thread_id=thread_id)
+    await sender.reply(message, f"✅ Гілку збережено як: *{title}*", parse_mode="Markdown", quote=True)
+    await log_admin_action(message.from_user.id, message.from_user.username, "bind_thread", chat_id=chat_id, thread_id=thread_id)
 
 @dp.message_handler(commands=["blacklist"])
 async def cmd_blacklist(message: types.Message):
     # Доступ тільки для адмінів
     if message.chat.id != MODERATORS_CHAT_ID:
-        await message.answer("⛔ Ця команда доступна лише в адмін-групі")
+        await sender.reply(message, "⛔ Ця команда доступна лише в адмін-групі")
         return
 
-    cursor.execute("SELECT user_id, username, first_name, added_at FROM blacklist ORDER BY added_at DESC")
-    users = cursor.fetchall()
+    users = await db.fetchall("SELECT user_id, username, first_name, added_at FROM blacklist ORDER BY added_at DESC")
 
     if not users:
-        await message.answer("✅ Чорний список порожній")
+        await sender.reply(message, "✅ Чорний список порожній")
         return
 
     text = "<b>🚫 Чорний список користувачів:</b>\n\n"
@@ -770,9 +718,47 @@ async def cmd_blacklist(message: types.Message):
     for user_id, username, first_name, added_at in users:
         uname = f"@{username}" if username else ""
         text += f"👤 <b>{first_name}</b> {uname} (<code>{user_id}</code>) — {added_at}\n"
-        kb.add(InlineKeyboardButton(f"❌ Розблокувати {first_name}", callback_data=f"unblacklist_{user_id}"))
+        kb.add(InlineKeyboardButton(f"❌ Розблокувати {first_name}", callback_data=pack(UNBLACKLIST, user_id)))
+
+    await sender.reply(message, text, parse_mode="HTML", reply_markup=kb)
+
+@dp.message_handler(commands=["schedule"])
+async def cmd_schedule(message: types.Message):
+    if message.chat.id != MODERATORS_CHAT_ID:
+        await sender.reply(message, "⛔ Ця команда доступна лише в адмін-групі")
+        return
+
+    # /schedule <ad_id> <YYYY-MM-DD HH:MM> [пріоритет]
+    parts = message.get_args().split()
+    try:
+        ad_id = int(parts[0])
+        when = datetime.strptime(f"{parts[1]} {parts[2]}", "%Y-%m-%d %H:%M").astimezone()
+        priority = int(parts[3]) if len(parts) > 3 else 0
+    except (IndexError, ValueError):
+        await sender.reply(message, "❌ Формат: `/schedule 123 2024-05-01 18:30 [пріоритет]`", parse_mode="Markdown", quote=True)
+        return
+
+    row = await db.fetchone("SELECT category FROM ads WHERE id=? AND is_published=0 AND is_rejected=0", (ad_id,))
+    if not row:
+        await sender.reply(message, "Оголошення не знайдено або вже оброблене ❌", quote=True)
+        return
+
+    await publish_queue.enqueue(ad_id, row[0], scheduled_at=when, priority=priority)
+    await sender.reply(message, f"⏳ Оголошення #{ad_id} заплановано на {when:%Y-%m-%d %H:%M}", quote=True)
+    await log_admin_action(message.from_user.id, message.from_user.username, f"schedule: {when:%Y-%m-%d %H:%M}", ad_id)
+
+@dp.message_handler(commands=["reloadwords"])
+async def cmd_reload_words(message: types.Message):
+    if message.chat.id != MODERATORS_CHAT_ID:
+        await sender.reply(message, "⛔ Ця команда доступна лише в адмін-групі")
+        return
+
+    # Перечитуємо BANNED_WORDS з .env та файл зі словами
+    words = parse_banned_words(dotenv_values(env_path).get("BANNED_WORDS", os.getenv("BANNED_WORDS")))
+    content_filter.reload(words)
 
-    await message.answer(text, parse_mode="HTML", reply_markup=kb)
+    await sender.reply(message, f"✅ Список заборонених слів оновлено: {len(content_filter)} шт.")
+    await log_admin_action(message.from_user.id, message.from_user.username, "reload_words", chat_id=message.chat.id)
 
 # -------------------------------
 # 🔹 Статистика
@@ -780,43 +766,35 @@ async def cmd_blacklist(message: types.Message):
 @dp.message_handler(commands="stats")
 async def cmd_stats(message: types.Message):
     # Перевіряємо, що команда викликана у групі модераторів
-    if str(message.chat.id) != os.getenv("MODERATORS_CHAT_ID"):
-        await message.reply("⛔ Ця команда доступна лише у групі модераторів.")
+    if message.chat.id != MODERATORS_CHAT_ID:
+        await sender.reply(message, "⛔ Ця команда доступна лише у групі модераторів.", quote=True)
         return
 
-    now = datetime.now()
-    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-
-    cursor.execute("SELECT COUNT(*) FROM ads WHERE created_at >= ?", (today,))
-    today_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM ads WHERE created_at >= ?", (week_ago,))
-    week_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM ads WHERE created_at >= ?", (month_ago,))
-    month_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT SUM(shares) FROM ads")
-    total_shares = cursor.fetchone()[0] or 0
+    summary = await stats_store.summary()
+    total_shares = summary["shares"] + share_counter.pending()
+    top = await stats_store.breakdown("category", date_from=window_start(30))
 
-    await message.answer(
+    text = (
         f"📊 Статистика:\n"
-        f"📅 За сьогодні: {today_count}\n"
-        f"🗓 За тиждень: {week_count}\n"
-        f"📆 За місяць: {month_count}\n"
+        f"📅 За сьогодні: {summary['today']}\n"
+        f"🗓 За тиждень: {summary['week']}\n"
+        f"📆 За місяць: {summary['month']}\n"
         f"🔗 Всього пересилань: {total_shares}"
     )
-    log_admin_action(message.from_user.id, message.from_user.username, "view_stats", chat_id=message.chat.id)
+    if top:
+        text += "\n\n🔹 Категорії за місяць:\n" + "\n".join(
+            f"{row['category'] or '—'}: {row['created']} (✅ {row['published']}, ❌ {row['rejected']})"
+            for row in top[:10]
+        )
+    await sender.reply(message, text)
+    await log_admin_action(message.from_user.id, message.from_user.username, "view_stats", chat_id=message.chat.id)
 
 # -------------------------------
 # 🔹 API
 # -------------------------------
 @app.get("/threads")
 async def get_threads():
-    cursor.execute("SELECT chat_id, thread_id, title FROM threads")
-    rows = cursor.fetchall()
+    rows = await db.fetchall("SELECT chat_id, thread_id, title FROM threads")
     return {"threads": [{"chat_id": r[0], "thread_id": r[1], "title": r[2]} for r in rows]}
 
 # -------------------------------
@@ -824,205 +802,153 @@ async def get_threads():
 # -------------------------------
 @app.on_event("startup")
 async def on_startup():
+    await migrate(db)
+    await categories.load()
+    await user_gate.load()
+    await duplicates.start()
+    await storage.start()
+    share_counter.start()
+    autopost.start()
+    backups.start()
+    scheduler.start()
+    await update_dedupe.start()
+    update_workers.start()
     await bot.set_webhook(WEBHOOK_URL)
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await update_workers.close()
+    scheduler.shutdown(wait=False)
+    # shutdown() не чекає задач, що вже виконуються: дочікуємось поточного
+    # автопостингу, щоб він не писав у вже закриту базу
+    async with autopost.paused():
+        await sender.drain()
+        await storage.close()
+        await share_counter.close()
+        await update_dedupe.close()
+        await db.close()
+
 @app.post(WEBHOOK_PATH)
 async def webhook(request: Request):
-    data = await request.json()
-    update = types.Update.to_object(data)
-    from aiogram import Bot
-    Bot.set_current(bot)
-    Dispatcher.set_current(dp)
-    await dp.process_update(update)
+    try:
+        update = types.Update.to_object(await request.json())
+    except Exception:
+        return JSONResponse(content={"ok": False}, status_code=400)
+
+    # Повторна доставка вже прийнятого апдейта — підтверджуємо і не обробляємо
+    if update_dedupe.is_duplicate(update):
+        return {"ok": True}
+
+    # Обробка йде у фоні; при переповненій черзі Telegram повторить доставку пізніше
+    if not update_workers.submit(update):
+        return JSONResponse(content={"ok": False}, status_code=503)
+    update_dedupe.remember(update)
     return {"ok": True}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "updates": {**update_workers.stats(), "duplicates": update_dedupe.duplicates,
+                    "blocked": user_gate_middleware.dropped},
+        "sender": sender.stats(),
+        "publish_queue": await publish_queue.stats(),
+    }
+
+LOGS_PAGE_LIMIT = 500
+
 @app.get("/logs", response_class=HTMLResponse)
 async def get_logs(
     admin_id: int | None = None,
-    action: str | None = None,
+    action: str | None = None,     # префікс дії, наприклад "publish"
     date_from: str | None = None,
     date_to: str | None = None,
     chat_id: int | None = None,
     thread_id: int | None = None,
-    published: str | None = None   # "yes", "no" або None
+    published: str | None = None,  # "yes", "no" або None
+    cursor: str | None = None,
+    limit: int = 100
 ):
-    # Отримуємо доступні значення для select
-    cursor.execute("SELECT DISTINCT admin_id, admin_username FROM admin_logs WHERE admin_id IS NOT NULL")
-    admins = cursor.fetchall()
-
-    cursor.execute("SELECT DISTINCT chat_id FROM admin_logs WHERE chat_id IS NOT NULL")
-    chats = [row[0] for row in cursor.fetchall()]
+    filters = {
+        "admin_id": admin_id, "action": action, "date_from": date_from, "date_to": date_to,
+        "chat_id": chat_id, "thread_id": thread_id, "published": published,
+    }
+    try:
+        query = LogsQuery(cursor=cursor, **filters)
+    except ValueError as e:
+        return HTMLResponse(f"<h3>❌ Некоректний фільтр: {escape(str(e))}</h3>", status_code=400)
 
-    cursor.execute("SELECT DISTINCT thread_id FROM admin_logs WHERE thread_id IS NOT NULL")
-    threads = [row[0] for row in cursor.fetchall()]
+    limit = max(1, min(limit, LOGS_PAGE_LIMIT))
+    return StreamingResponse(stream_logs_page(db, log_facets, query, filters, limit), media_type="text/html")
 
-    # Базовий SQL
-    query = """
-        SELECT id, admin_id, admin_username, action, ad_id, chat_id, thread_id, created_at
-        FROM admin_logs
-        WHERE 1=1
-    """
-    params = []
-
-    if admin_id:
-        query += " AND admin_id=?"
-        params.append(admin_id)
-    if action:
-        query += " AND action LIKE ?"
-        params.append(f"%{action}%")
-    if date_from:
-        query += " AND date(created_at) >= date(?)"
-        params.append(date_from)
-    if date_to:
-        query += " AND date(created_at) <= date(?)"
-        params.append(date_to)
-    if chat_id:
-        query += " AND chat_id=?"
-        params.append(chat_id)
-    if thread_id:
-        query += " AND thread_id=?"
-        params.append(thread_id)
-    if published == "yes":
-        query += " AND action LIKE 'publish%'"
-    elif published == "no":
-        query += " AND action LIKE 'reject%'"
-
-    query += " ORDER BY created_at DESC LIMIT 200"
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-
-    # HTML-форма + таблиця
-    html = """
-    <html>
-    <head>
-        <title>Admin Logs</title>
-        <style>
-            body { font-family: Arial, sans-serif; padding: 20px; }
-            table { border-collapse: collapse; width: 100%; margin-top: 20px; }
-            th, td { border: 1px solid #ccc; padding: 8px; text-align: left; }
-            th { background-color: #f4f4f4; }
-            tr:nth-child(even) { background-color: #fafafa; }
-            .filters { margin-bottom: 20px; }
-            .filters label { margin-right: 10px; }
-            .filters select, .filters input { margin-right: 15px; }
-        </style>
-    </head>
-    <body>
-        <h1>Admin Logs</h1>
-        <form method="get" class="filters">
-
-            <label>Admin:
-                <select name="admin_id">
-                    <option value="">-- All --</option>
-    """
+@app.get("/stats")
+async def get_stats(
+    group_by: str = "day",         # day (часовий ряд), category, district
+    date_from: str | None = None,  # YYYY-MM-DD, за замовчуванням — останні 30 днів
+    date_to: str | None = None,
+    category: str | None = None,
+    district: str | None = None
+):
+    try:
+        start = date.fromisoformat(date_from) if date_from else window_start(30)
+        end = date.fromisoformat(date_to) if date_to else None
+        rows = await stats_store.breakdown(group_by, start, end, category, district)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
 
-    for a_id, a_user in admins:
-        label = f"{a_id} (@{a_user})" if a_user else str(a_id)
-        selected = "selected" if str(admin_id) == str(a_id) else ""
-        html += f"<option value='{a_id}' {selected}>{label}</option>"
+    totals = await stats_store.totals()
+    totals["shares"] += share_counter.pending()
+    return {"totals": totals, "group_by": group_by, "rows": rows}
 
-    html += """
-                </select>
-            </label>
+ADS_PAGE_LIMIT = 1000
 
-            <label>Chat:
-                <select name="chat_id">
-                    <option value="">-- All --</option>
+@app.get("/ads")
+async def list_ads(
+    cursor: str | None = None,
+    limit: int = 100,
+    fields: str | None = None,
+    status: str | None = None,     # published, rejected, queued, pending
+    category: str | None = None,
+    district: str | None = None,
+    user_id: int | None = None,
+    date_from: str | None = None,  # YYYY-MM-DD
+    date_to: str | None = None,
+    stream: str | None = None      # "ndjson" або "json" — вивантажити всю вибірку потоком
+):
     """
-
-    for chat in chats:
-        selected = "selected" if str(chat_id) == str(chat) else ""
-        html += f"<option value='{chat}' {selected}>{chat}</option>"
-
-    html += """
-                </select>
-            </label>
-
-            <label>Thread:
-                <select name="thread_id">
-                    <option value="">-- All --</option>
+    Оголошення від новіших до старіших. Без stream повертає одну сторінку,
+    курсор наступної — у заголовку X-Next-Cursor.
     """
+    try:
+        query = AdsQuery(fields, status, category, district, user_id, date_from, date_to, cursor)
+        if stream == "ndjson":
+            return StreamingResponse(query.stream_ndjson(db), media_type="application/x-ndjson")
+        if stream == "json":
+            return StreamingResponse(query.stream_json(db), media_type="application/json")
 
-    for t in threads:
-        selected = "selected" if str(thread_id) == str(t) else ""
-        html += f"<option value='{t}' {selected}>{t}</option>"
-
-    html += """
-                </select>
-            </label>
-
-            <label>Status:
-                <select name="published">
-                    <option value="">-- All --</option>
-                    <option value="yes" {yes_sel}>Published</option>
-                    <option value="no" {no_sel}>Rejected</option>
-                </select>
-            </label>
-
-            <label>Date from:
-                <input type="date" name="date_from" value="{date_from}">
-            </label>
-
-            <label>Date to:
-                <input type="date" name="date_to" value="{date_to}">
-            </label>
-
-            <input type="submit" value="Filter">
-        </form>
-        <table>
-            <tr>
-                <th>ID</th>
-                <th>Admin ID</th>
-                <th>Username</th>
-                <th>Action</th>
-                <th>Ad ID</th>
-                <th>Chat</th>
-                <th>Thread</th>
-                <th>Time</th>
-            </tr>
-    """.format(
-        yes_sel="selected" if published == "yes" else "",
-        no_sel="selected" if published == "no" else "",
-        date_from=date_from or "",
-        date_to=date_to or ""
-    )
-
-    for r in rows:
-        html += f"""
-        <tr>
-            <td>{r[0]}</td>
-            <td>{r[1]}</td>
-            <td>@{r[2] if r[2] else ''}</td>
-            <td>{r[3]}</td>
-            <td>{r[4] if r[4] else ''}</td>
-            <td>{r[5] if r[5] else ''}</td>
-            <td>{r[6] if r[6] else ''}</td>
-            <td>{r[7]}</td>
-        </tr>
-        """
-
-    html += "</table></body></html>"
-    return HTMLResponse(content=html)
-
-@app.get("/ads")
-async def list_ads():
-    cursor.execute("SELECT * FROM ads ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-
-    # Отримуємо назви колонок з cursor.description
-    columns = [col[0] for col in cursor.description]
-
-    ads = [dict(zip(columns, row)) for row in rows]
+        items, next_cursor = await query.page(db, max(1, min(limit, ADS_PAGE_LIMIT)))
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
 
-    return JSONResponse(content=ads)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(content=items, headers=headers)
 
 @app.get("/backup")
 async def backup_db():
     """
-    Повертає файл бази даних для скачування.
+    Повертає узгоджений знімок бази даних, стиснутий gzip, потоком.
+    Знімок робиться до відповіді, тож помилка повертає 500, а не обірваний файл.
     """
-    return FileResponse(DB_PATH, filename="bot_backup.db", media_type="application/octet-stream")
+    try:
+        await share_counter.flush()
+        path = await backups.take()
+    except Exception as e:
+        logging.exception("❌ Не вдалося зробити знімок бази")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    return StreamingResponse(
+        backups.stream(path), media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="bot_backup.db.gz"'}
+    )
 
 # -------------------------------
 # 🔹 Ендпоінт для відновлення з бекапу
@@ -1039,7 +965,7 @@ async def restore_form():
         <body>
             <h2>Відновлення бази даних</h2>
             <form action="/restore" method="post" enctype="multipart/form-data">
-                <input type="file" name="file" accept=".db">
+                <input type="file" name="file" accept=".db,.gz">
                 <button type="submit">Відновити</button>
             </form>
         </body>
@@ -1047,28 +973,38 @@ async def restore_form():
     """
     return HTMLResponse(content=html_content)
 
+@asynccontextmanager
+async def paused_for_restore():
+    """
+    На час копіювання відновленої бази зупиняє всіх, хто в неї пише:
+    обробку апдейтів, автопостинг і відкладені збереження. Дані в пам'яті,
+    що стосувались старої бази, відкидаються або перечитуються з нової ще
+    до того, як обробка відновиться.
+    """
+    async with update_workers.paused(), autopost.paused(), \
+            storage.paused(), share_counter.paused(), update_dedupe.paused():
+        yield
+        share_counter.discard()
+        await storage.reload()
+        await categories.load()
+        renderer.clear()
+        ad_search.invalidate()
+        log_facets.invalidate()
+        await user_gate.load()
+        await duplicates.start()
+
 @app.post("/restore")
 async def restore_db(file: UploadFile = File(...)):
-    global conn, cursor
     try:
-        # Закриваємо поточне з'єднання
-        conn.close()
-
-        # Зберігаємо завантажений файл як тимчасовий
-        temp_path = f"temp_{DB_PATH}"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Замінюємо стару базу новою
-        shutil.move(temp_path, DB_PATH)
-
-        # Перепідключаємося
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-        cursor = conn.cursor()
-
-        return HTMLResponse("<h3>✅ База успішно відновлена!</h3>")
+        # Файл перевіряється, мігрується і лише тоді переноситься в живу базу
+        await backups.restore(file, pause=paused_for_restore)
+    except ValueError as e:
+        return HTMLResponse(f"<h3>❌ Файл не підходить: {escape(str(e))}</h3>", status_code=400)
     except Exception as e:
-        return HTMLResponse(f"<h3>❌ Сталася помилка: {e}</h3>")
+        logging.exception("❌ Помилка відновлення бази")
+        return HTMLResponse(f"<h3>❌ Сталася помилка: {escape(str(e))}</h3>", status_code=500)
+
+    return HTMLResponse("<h3>✅ База успішно відновлена!</h3>")
 
 # -------------------------------
 # 🔹 Локальний запуск
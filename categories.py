@@ -0,0 +1,42 @@
+# -------------------------------
+# 🔹 Реєстр категорій (гілок)
+# -------------------------------
+class CategoryRegistry:
+    """
+    Кеш таблиці threads у пам'яті процесу. Завантажується на старті
+    та перезавантажується після кожного запису через bind().
+    Пошук гілки для категорії — звичайний доступ до словника.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.version = 0
+        self._threads: dict[tuple[int, str], int] = {}
+        self._titles: dict[int, tuple[str, ...]] = {}
+
+    async def load(self):
+        rows = await self.db.fetchall("SELECT chat_id, thread_id, title FROM threads ORDER BY id")
+        threads = {}
+        titles = {}
+        for chat_id, thread_id, title in rows:
+            # як і раніше, для дубльованої назви беремо першу прив'язану гілку
+            if (chat_id, title) not in threads:
+                threads[(chat_id, title)] = thread_id
+                titles.setdefault(chat_id, []).append(title)
+        self._threads = threads
+        self._titles = {chat_id: tuple(t) for chat_id, t in titles.items()}
+        self.version += 1
+
+    def thread_id(self, chat_id: int, title: str) -> int | None:
+        return self._threads.get((chat_id, title))
+
+    def titles(self, chat_id: int) -> tuple[str, ...]:
+        return self._titles.get(chat_id, ())
+
+    async def bind(self, chat_id: int, thread_id: int, title: str):
+        await self.db.execute("""
+            INSERT INTO threads (chat_id, thread_id, title)
+            VALUES (?, ?, ?)
+            ON CONFLICT(chat_id, thread_id) DO UPDATE SET title=excluded.title
+        """, (chat_id, thread_id, title))
+        await self.load()
@@ -0,0 +1,128 @@
+import os
+import re
+import time
+import unicodedata
+import logging
+
+
+# -------------------------------
+# 🔹 Нормалізація тексту
+# -------------------------------
+# Латинські (та деякі інші) символи, які візуально збігаються з кириличними,
+# зводимо до одного канонічного вигляду. Та сама таблиця застосовується і до
+# заборонених слів, і до тексту, тож "scam" і "ѕсаm" стають однаковими.
+HOMOGLYPHS = {
+    "a": "а", "c": "с", "e": "е", "i": "і", "j": "ј", "k": "к", "m": "м",
+    "h": "н", "o": "о", "p": "р", "s": "ѕ", "t": "т", "x": "х", "y": "у",
+    "b": "в", "0": "о", "@": "а", "3": "з",
+}
+INVISIBLE = "\u00ad\u200b\u200c\u200d\u2060\ufeff"
+
+_TRANSLATION = str.maketrans({**HOMOGLYPHS, **{ch: None for ch in INVISIBLE}})
+
+
+def normalize(text: str) -> str:
+    # NFKC прибирає "повноширинні" та стилізовані символи, casefold — регістр,
+    # NFD + видалення діакритики — комбіновані наголоси та подібні трюки
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(ch for ch in unicodedata.normalize("NFD", text) if unicodedata.category(ch) != "Mn")
+    return text.translate(_TRANSLATION)
+
+
+def _trie_pattern(words) -> str:
+    """
+    Будує регулярний вираз у вигляді префіксного дерева: спільні префікси
+    об'єднуються, тож на кожній позиції перевіряється не весь список слів,
+    а лише гілки, що починаються з поточного символу.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if terminal else body
+
+    return build(trie)
+
+
+# -------------------------------
+# 🔹 Фільтр заборонених слів
+# -------------------------------
+class ContentFilter:
+    """
+    Компілює список заборонених слів в один регулярний вираз-дерево.
+    Список можна доповнювати файлом (одне слово на рядок), який
+    перечитується без перезапуску, щойно змінюється його mtime.
+    """
+
+    def __init__(self, words=(), words_file: str | None = None, check_interval: float = 5.0):
+        self.words_file = words_file
+        self.check_interval = check_interval
+        self._base_words = list(words)
+        self._file_words = []
+        self._file_mtime = None
+        self._next_check = 0.0
+        self._pattern = None
+        self._originals = {}
+        self.reload()
+
+    def reload(self, words=None):
+        """
+        Перечитує файл зі словами (якщо задано) і перекомпілює фільтр.
+        words, якщо передано, замінює базовий список (з BANNED_WORDS).
+        """
+        if words is not None:
+            self._base_words = list(words)
+        self._file_words = []
+        self._file_mtime = None
+        if self.words_file and os.path.exists(self.words_file):
+            self._file_mtime = os.path.getmtime(self.words_file)
+            with open(self.words_file, encoding="utf-8") as f:
+                self._file_words = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        self._compile()
+
+    def maybe_reload(self):
+        # stat файлу не частіше, ніж раз на check_interval секунд
+        if not self.words_file:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        mtime = os.path.getmtime(self.words_file) if os.path.exists(self.words_file) else None
+        if mtime != self._file_mtime:
+            self.reload()
+
+    def _compile(self):
+        originals = {}
+        for word in self._base_words + self._file_words:
+            word = word.strip().lower()
+            key = normalize(word)
+            if key and key not in originals:
+                originals[key] = word
+        self._originals = originals
+        self._pattern = re.compile(_trie_pattern(originals)) if originals else None
+        logging.info(f"🧹 Фільтр слів скомпільовано: {len(originals)} шт.")
+
+    def __len__(self):
+        return len(self._originals)
+
+    def find(self, text: str) -> str | None:
+        """Повертає перше знайдене заборонене слово (у вихідному вигляді) або None."""
+        self.maybe_reload()
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(normalize(text))
+        if not match:
+            return None
+        return self._originals.get(match.group(0), match.group(0))
@@ -0,0 +1,54 @@
+from collections import Counter
+
+from write_behind import WriteBehind
+
+
+# -------------------------------
+# 🔹 Лічильник поширень
+# -------------------------------
+class ShareCounter(WriteBehind):
+    """
+    Накопичує поширення оголошень у пам'яті і раз на flush_interval секунд
+    записує їх у ads.shares однією транзакцією. Обробник inline-запитів
+    лише збільшує лічильник у пам'яті, не чекаючи на базу.
+    """
+
+    flush_error = "❌ Не вдалося зберегти лічильники поширень"
+
+    def __init__(self, db, flush_interval: float = 10.0):
+        super().__init__(flush_interval)
+        self.db = db
+        self._pending: Counter[int] = Counter()
+
+    def add(self, ad_id: int, n: int = 1):
+        self._pending[ad_id] += n
+
+    def pending(self, ad_id: int | None = None) -> int:
+        """Ще не збережені поширення: для одного оголошення або всього."""
+        if ad_id is None:
+            return sum(self._pending.values())
+        return self._pending.get(ad_id, 0)
+
+    def discard(self):
+        """Відкидає незбережені прирости (вони стосуються вже заміненої бази)."""
+        self._pending.clear()
+
+    # --- життєвий цикл ---
+    def start(self):
+        self._start_flushing()
+
+    async def _flush(self):
+        """Записує накопичені прирости однією транзакцією."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, Counter()
+
+        def run(cur):
+            cur.executemany("UPDATE ads SET shares = shares + ? WHERE id=?",
+                            [(n, ad_id) for ad_id, n in batch.items()])
+
+        try:
+            await self.db.transaction(run)
+        except Exception:
+            self._pending.update(batch)
+            raise
@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+# -------------------------------
+# 🔹 Доступ до бази даних
+# -------------------------------
+class Database:
+    """
+    Обгортка над SQLite, яка виконує всі запити поза event loop.
+    Записи серіалізуються через одну чергу (окремий потік-письменник з власним
+    з'єднанням), читання йдуть через пул потоків, кожен зі своїм з'єднанням.
+    База працює в режимі WAL, тож читачі й письменник не блокують одне одного.
+    Кожен запит отримує власний курсор — спільного глобального курсора немає.
+    """
+
+    def __init__(self, path: str, read_pool_size: int = 4, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=read_pool_size, thread_name_prefix="db-reader")
+        self._write_conn: sqlite3.Connection | None = None
+        self._local = threading.local()
+
+    # --- з'єднання ---
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._write_conn is None:
+            conn = self._open()
+            conn.execute("PRAGMA journal_mode=WAL")
+            # У режимі WAL NORMAL безпечний для цілісності і не робить fsync на кожен commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._write_conn = conn
+        return self._write_conn
+
+    def _reader_connection(self) -> sqlite3.Connection:
+        # з'єднання читача живе разом із його потоком
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        return conn
+
+    def _close_writer(self):
+        if self._write_conn is not None:
+            self._write_conn.close()
+            self._write_conn = None
+
+    # --- робота всередині потоків БД ---
+    def _read(self, fn):
+        cur = self._reader_connection().cursor()
+        try:
+            return fn(cur)
+        finally:
+            cur.close()
+
+    def _write(self, fn):
+        conn = self._writer_connection()
+        cur = conn.cursor()
+        try:
+            result = fn(cur)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    async def _submit_read(self, fn):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._read, fn)
+
+    async def _submit_write(self, fn):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._write, fn)
+
+    # --- публічний async API ---
+    async def fetchone(self, sql: str, params=()):
+        return await self._submit_read(lambda cur: cur.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params=()):
+        return await self._submit_read(lambda cur: cur.execute(sql, params).fetchall())
+
+    async def read(self, fn):
+        """Виконує fn(cursor) на з'єднанні для читання."""
+        return await self._submit_read(fn)
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Виконує запис через чергу письменника і повертає lastrowid."""
+        return await self._submit_write(lambda cur: cur.execute(sql, params).lastrowid)
+
+    async def executemany(self, sql: str, seq_of_params):
+        await self._submit_write(lambda cur: cur.executemany(sql, seq_of_params))
+
+    async def transaction(self, fn):
+        """Виконує fn(cursor) в одній транзакції в потоці письменника."""
+        return await self._submit_write(fn)
+
+    def _backup(self, dest_path: str, pages: int, sleep: float, max_restarts: int):
+        src = self._open()
+        dst = sqlite3.connect(dest_path)
+        restarts = 0
+        remaining_before = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, remaining_before
+            # якщо базу змінило інше з'єднання, SQLite починає копіювання спочатку
+            if remaining_before is not None and remaining > remaining_before:
+                restarts += 1
+                if restarts > max_restarts:
+                    raise _BackupRestarted()
+            remaining_before = remaining
+
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+            except _BackupRestarted:
+                # під постійним записом копіюємо одним кроком: у WAL це знімок
+                # на момент початку читання, і письменник при цьому не блокується
+                src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+            src.close()
+
+    async def backup(self, dest_path: str, pages: int = 1024, sleep: float = 0.005, max_restarts: int = 3):
+        """
+        Узгоджена копія бази у dest_path через онлайн-бекап SQLite порціями
+        по pages сторінок. Працює в окремому потоці і з окремим з'єднанням,
+        не займаючи ні письменника, ні читачів.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._backup, dest_path, pages, sleep, max_restarts)
+
+    def _restore(self, src_path: str):
+        conn = self._writer_connection()
+        src = sqlite3.connect(src_path)
+        try:
+            src.backup(conn)
+        finally:
+            src.close()
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def restore(self, src_path: str):
+        """
+        Замінює вміст бази вмістом src_path через бекап у з'єднання письменника.
+        Записи на цей час чекають у черзі, читачі до кінця бачать стару версію,
+        а потім одразу нову — файл і з'єднання не перевідкриваються.
+        """
+        await self._submit_write(lambda cur: self._restore(src_path))
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self._close_writer)
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
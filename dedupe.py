@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+
+from aiogram import types
+
+from write_behind import WriteBehind
+
+
+def update_keys(update: types.Update) -> list[str]:
+    """Ключі ідемпотентності апдейта: update_id і, для кнопок, id callback-запиту."""
+    keys = [f"u:{update.update_id}"]
+    if update.callback_query is not None:
+        keys.append(f"c:{update.callback_query.id}")
+    return keys
+
+
+# -------------------------------
+# 🔹 Відсіювання повторних апдейтів
+# -------------------------------
+class UpdateDedupe(WriteBehind):
+    """
+    Множина вже прийнятих апдейтів за останні ttl секунд (не більше max_size).
+    Перевірка — лише словник у пам'яті; нові ключі відкладено, пакетами,
+    зберігаються в таблицю seen_updates, щоб після перезапуску повторна
+    доставка того самого апдейта теж відсіювалась.
+    """
+
+    flush_error = "❌ Не вдалося зберегти прийняті апдейти"
+
+    def __init__(self, db, ttl: int = 3600, max_size: int = 100_000, flush_interval: float = 1.0):
+        super().__init__(flush_interval)
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._pending: list[tuple[str, int]] = []
+        self.duplicates = 0
+
+    # --- життєвий цикл ---
+    async def start(self):
+        cutoff = int(time.time() - self.ttl)
+        await self.db.execute("DELETE FROM seen_updates WHERE seen_at < ?", (cutoff,))
+        rows = await self.db.fetchall(
+            "SELECT key, seen_at FROM seen_updates ORDER BY seen_at DESC LIMIT ?", (self.max_size,)
+        )
+        self._seen = OrderedDict((key, seen_at) for key, seen_at in reversed(rows))
+        self._start_flushing()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        cutoff = int(time.time() - self.ttl)
+
+        def run(cur):
+            cur.executemany("INSERT OR IGNORE INTO seen_updates (key, seen_at) VALUES (?, ?)", batch)
+            cur.execute("DELETE FROM seen_updates WHERE seen_at < ?", (cutoff,))
+
+        try:
+            await self.db.transaction(run)
+        except Exception:
+            self._pending = batch + self._pending
+            raise
+
+    # --- перевірка ---
+    def _evict(self, now: float):
+        cutoff = now - self.ttl
+        seen = self._seen
+        while seen:
+            key, ts = next(iter(seen.items()))
+            if ts >= cutoff and len(seen) <= self.max_size:
+                break
+            seen.popitem(last=False)
+
+    def is_duplicate(self, update: types.Update) -> bool:
+        if any(key in self._seen for key in update_keys(update)):
+            self.duplicates += 1
+            return True
+        return False
+
+    def remember(self, update: types.Update):
+        """Запам'ятовує апдейт (лише після того, як його прийнято в обробку)."""
+        now = time.time()
+        for key in update_keys(update):
+            self._seen[key] = now
+            self._pending.append((key, int(now)))
+        self._evict(now)
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+
+from content_filter import normalize
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+
+
+def ad_text(title: str, description: str) -> str:
+    return normalize(f"{title} {description}")
+
+
+def exact_key(text: str) -> str:
+    """Відбиток тексту для точних повторів (без урахування пробілів і пунктуації)."""
+    return hashlib.blake2b(" ".join(WORD_RE.findall(text)).encode(), digest_size=16).hexdigest()
+
+
+def shingles(text: str) -> set[int]:
+    """Пари сусідніх слів (для коротких текстів — окремі слова) як 32-бітні хеші."""
+    words = WORD_RE.findall(text)
+    if len(words) < 3:
+        grams = words
+    else:
+        grams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return {zlib.crc32(g.encode()) for g in grams}
+
+
+# -------------------------------
+# 🔹 Пошук схожих оголошень
+# -------------------------------
+class DuplicateIndex:
+    """
+    MinHash-підписи заголовка й опису останніх оголошень з LSH-індексом:
+    підпис ділиться на bands смуг, оголошення з однаковою смугою — кандидати,
+    схожість яких оцінюється за часткою однакових значень підпису.
+    Підпис рахується в потоці (fingerprint), пошук у пам'яті — check().
+    Індекс змінюється лише на event loop. Підписи зберігаються в
+    ad_signatures, тож на старті обчислюються лише для нових оголошень.
+    """
+
+    def __init__(self, db, num_perm: int = 32, bands: int = 8, threshold: float = 0.7,
+                 window_days: int = 30, max_size: int = 50_000):
+        assert num_perm % bands == 0
+        self.db = db
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window_days = window_days
+        self.max_size = max_size
+        rnd = random.Random(20240501)
+        self._perms = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(num_perm)]
+        # ad_id -> (user_id, підпис, точний відбиток)
+        self._entries: OrderedDict[int, tuple[int, tuple[int, ...], str]] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._exact: dict[str, set[int]] = {}
+
+    # --- підписи ---
+    def signature(self, text: str) -> tuple[int, ...]:
+        hashes = shingles(text) or {0}
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, sig: tuple[int, ...]):
+        r = self.rows
+        return [(i, sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def similarity(self, a: tuple[int, ...], b: tuple[int, ...]) -> float:
+        return sum(x == y for x, y in zip(a, b)) / self.num_perm
+
+    # --- індекс у пам'яті ---
+    def add(self, ad_id: int, user_id: int, sig: tuple[int, ...], exact: str):
+        if ad_id in self._entries:
+            self._remove(ad_id)
+        self._entries[ad_id] = (user_id, sig, exact)
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, set()).add(ad_id)
+        self._exact.setdefault(exact, set()).add(ad_id)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, ad_id: int):
+        user_id, sig, exact = self._entries.pop(ad_id)
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(ad_id)
+                if not bucket:
+                    del self._buckets[key]
+        ids = self._exact.get(exact)
+        if ids is not None:
+            ids.discard(ad_id)
+            if not ids:
+                del self._exact[exact]
+
+    def _fingerprint(self, title: str, description: str) -> tuple[tuple[int, ...], str]:
+        text = ad_text(title, description)
+        return self.signature(text), exact_key(text)
+
+    async def fingerprint(self, title: str, description: str) -> tuple[tuple[int, ...], str]:
+        """(підпис, відбиток) тексту; рахується в потоці, щоб довгий опис не блокував event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._fingerprint, title, description)
+
+    def check(self, sig: tuple[int, ...], exact: str):
+        """
+        Повертає (exact, near): exact — ad_id з тим самим текстом,
+        near — [(ad_id, user_id, схожість)] від найсхожіших.
+        """
+        exact_ids = sorted(self._exact.get(exact, ()))
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates |= self._buckets.get(key, set())
+        near = []
+        for ad_id in candidates:
+            user_id, other, _ = self._entries[ad_id]
+            score = self.similarity(sig, other)
+            if score >= self.threshold:
+                near.append((ad_id, user_id, score))
+        near.sort(key=lambda n: -n[2])
+        return exact_ids, near
+
+    # --- збереження ---
+    @staticmethod
+    def pack(sig: tuple[int, ...]) -> bytes:
+        return array("Q", sig).tobytes()
+
+    @staticmethod
+    def unpack(blob: bytes) -> tuple[int, ...]:
+        return tuple(array("Q", blob))
+
+    def save(self, cur, ad_id: int, sig: tuple[int, ...], exact: str):
+        """
+        Записує підпис у транзакції вставки оголошення (у потоці письменника).
+        В індекс його додає add() на event loop після commit.
+        """
+        cur.execute(
+            "INSERT OR REPLACE INTO ad_signatures (ad_id, exact, sig) VALUES (?, ?, ?)",
+            (ad_id, exact, self.pack(sig))
+        )
+
+    async def start(self):
+        """Завантажує підписи оголошень за останні window_days і дораховує відсутні."""
+        self._entries.clear()
+        self._buckets.clear()
+        self._exact.clear()
+        cutoff = f"-{int(self.window_days)} days"
+        rows = await self.db.fetchall("""
+            SELECT a.id, a.user_id, s.exact, s.sig, a.title, a.description
+            FROM ads a LEFT JOIN ad_signatures s ON s.ad_id = a.id
+            WHERE a.created_at >= datetime('now', ?)
+            ORDER BY a.id
+        """, (cutoff,))
+
+        missing = []
+        for ad_id, user_id, exact, blob, title, description in rows:
+            if blob is not None and len(blob) == 8 * self.num_perm:
+                self.add(ad_id, user_id, self.unpack(blob), exact)
+            else:
+                missing.append((ad_id, user_id, title or "", description or ""))
+
+        if missing:
+            # обчислення підписів — поза event loop
+            loop = asyncio.get_running_loop()
+
+            def compute():
+                return [(ad_id, user_id, *self._fingerprint(title, description))
+                        for ad_id, user_id, title, description in missing]
+
+            computed = await loop.run_in_executor(None, compute)
+            await self.db.executemany(
+                "INSERT OR REPLACE INTO ad_signatures (ad_id, exact, sig) VALUES (?, ?, ?)",
+                [(ad_id, exact, self.pack(sig)) for ad_id, _, sig, exact in computed]
+            )
+            for ad_id, user_id, sig, exact in computed:
+                self.add(ad_id, user_id, sig, exact)
+        logging.info(f"🧬 Індекс схожих оголошень: {len(self._entries)} (дораховано {len(missing)})")
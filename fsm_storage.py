@@ -0,0 +1,229 @@
+import copy
+import json
+import logging
+import time
+import typing
+import zlib
+
+from aiogram.dispatcher.storage import BaseStorage
+
+from write_behind import WriteBehind
+
+
+# -------------------------------
+# 🔹 Кодування даних стану
+# -------------------------------
+# Дані форми зберігаються як компактний JSON; великі значення (наприклад,
+# довгий список фото) додатково стискаються zlib. Перший байт — тип запису.
+_RAW = b"j"
+_ZLIB = b"z"
+COMPRESS_THRESHOLD = 512
+
+
+def encode_data(data: dict) -> bytes:
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        return _ZLIB + zlib.compress(raw)
+    return _RAW + raw
+
+
+def decode_data(blob: bytes | None) -> dict:
+    if not blob:
+        return {}
+    kind, payload = blob[:1], blob[1:]
+    if kind == _ZLIB:
+        payload = zlib.decompress(payload)
+    return json.loads(payload.decode("utf-8"))
+
+
+# -------------------------------
+# 🔹 FSM-сховище на SQLite
+# -------------------------------
+class SQLiteStorage(WriteBehind, BaseStorage):
+    """
+    FSM-сховище, яке працює з пам'яттю, а в SQLite пише відкладено:
+    змінені записи збираються і раз на flush_interval секунд зберігаються
+    однією транзакцією. На старті стани відновлюються з таблиці fsm_states,
+    а форми без активності довше за ttl секунд видаляються.
+    """
+
+    flush_error = "❌ Не вдалося зберегти FSM-стани"
+
+    def __init__(self, db, flush_interval: float = 5.0, ttl: int = 2 * 24 * 3600):
+        WriteBehind.__init__(self, flush_interval)
+        self.db = db
+        self.ttl = ttl
+        self._records: dict[tuple[int, int], dict] = {}
+        self._dirty: set[tuple[int, int]] = set()
+        self._next_evict = 0.0
+
+    # --- життєвий цикл ---
+    async def _load(self):
+        cutoff = int(time.time() - self.ttl)
+        await self.db.execute("DELETE FROM fsm_states WHERE updated_at < ?", (cutoff,))
+        rows = await self.db.fetchall("SELECT chat_id, user_id, state, data, updated_at FROM fsm_states")
+        self._records = {
+            (chat_id, user_id): {"state": state, "data": decode_data(data), "bucket": {}, "ts": updated_at}
+            for chat_id, user_id, state, data, updated_at in rows
+        }
+        self._dirty.clear()
+        logging.info(f"💾 Відновлено FSM-станів: {len(self._records)}")
+
+    async def start(self):
+        await self._load()
+        self._start_flushing()
+
+    async def reload(self):
+        """Перечитує стани з бази (після її відновлення); незбережені зміни відкидаються."""
+        await self._load()
+
+    async def wait_closed(self):
+        pass
+
+    def _evict_expired(self):
+        now = time.time()
+        if now < self._next_evict:
+            return
+        self._next_evict = now + min(self.ttl, 300)
+        cutoff = now - self.ttl
+        for key in [k for k, rec in self._records.items() if rec["ts"] < cutoff]:
+            del self._records[key]
+            self._dirty.add(key)
+
+    async def _flush(self):
+        """Зберігає всі змінені записи однією транзакцією."""
+        self._evict_expired()
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        upserts, deletes = [], []
+        for key in keys:
+            rec = self._records.get(key)
+            if rec is None:
+                deletes.append(key)
+            else:
+                upserts.append((*key, rec["state"], encode_data(rec["data"]), int(rec["ts"])))
+
+        def run(cur):
+            if deletes:
+                cur.executemany("DELETE FROM fsm_states WHERE chat_id=? AND user_id=?", deletes)
+            if upserts:
+                cur.executemany("""
+                    INSERT INTO fsm_states (chat_id, user_id, state, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(chat_id, user_id) DO UPDATE SET
+                        state=excluded.state, data=excluded.data, updated_at=excluded.updated_at
+                """, upserts)
+
+        try:
+            await self.db.transaction(run)
+        except Exception:
+            self._dirty |= keys
+            raise
+
+    # --- робота із записами ---
+    def _key(self, chat, user) -> tuple[int, int]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return int(chat), int(user)
+
+    def _get(self, chat, user) -> dict | None:
+        return self._records.get(self._key(chat, user))
+
+    def _touch(self, chat, user) -> dict:
+        key = self._key(chat, user)
+        rec = self._records.get(key)
+        if rec is None:
+            rec = self._records[key] = {"state": None, "data": {}, "bucket": {}, "ts": 0}
+        rec["ts"] = time.time()
+        self._dirty.add(key)
+        return rec
+
+    def _cleanup(self, chat, user):
+        key = self._key(chat, user)
+        rec = self._records.get(key)
+        if rec is not None and rec["state"] is None and not rec["data"] and not rec["bucket"]:
+            del self._records[key]
+            self._dirty.add(key)
+
+    # --- API BaseStorage ---
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        rec = self._get(chat, user)
+        if rec is None:
+            return self.resolve_state(default)
+        return rec["state"]
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[dict] = None) -> typing.Dict:
+        rec = self._get(chat, user)
+        if rec is None:
+            return copy.deepcopy(default or {})
+        return copy.deepcopy(rec["data"])
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        self._touch(chat, user)["state"] = self.resolve_state(state)
+        self._cleanup(chat, user)
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        self._touch(chat, user)["data"] = copy.deepcopy(data or {})
+        self._cleanup(chat, user)
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        if data is None:
+            data = {}
+        self._touch(chat, user)["data"].update(copy.deepcopy(data), **kwargs)
+
+    async def reset_state(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          with_data: typing.Optional[bool] = True):
+        rec = self._touch(chat, user)
+        rec["state"] = None
+        if with_data:
+            rec["data"] = {}
+        self._cleanup(chat, user)
+
+    # Bucket-и (для throttling) зберігаються лише в пам'яті
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         default: typing.Optional[dict] = None) -> typing.Dict:
+        rec = self._get(chat, user)
+        if rec is None:
+            return copy.deepcopy(default or {})
+        return copy.deepcopy(rec["bucket"])
+
+    async def set_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         bucket: typing.Dict = None):
+        key = self._key(chat, user)
+        rec = self._records.setdefault(key, {"state": None, "data": {}, "bucket": {}, "ts": time.time()})
+        rec["bucket"] = copy.deepcopy(bucket or {})
+        self._cleanup(chat, user)
+
+    async def update_bucket(self, *,
+                            chat: typing.Union[str, int, None] = None,
+                            user: typing.Union[str, int, None] = None,
+                            bucket: typing.Dict = None, **kwargs):
+        if bucket is None:
+            bucket = {}
+        key = self._key(chat, user)
+        rec = self._records.setdefault(key, {"state": None, "data": {}, "bucket": {}, "ts": time.time()})
+        rec["bucket"].update(bucket, **kwargs)
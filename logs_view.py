@@ -0,0 +1,217 @@
+from datetime import date, timedelta
+from html import escape
+from urllib.parse import urlencode
+
+from ads_api import encode_cursor, decode_cursor
+
+
+# -------------------------------
+# 🔹 Значення для фільтрів
+# -------------------------------
+class LogFacets:
+    """
+    Списки адмінів, чатів і гілок для фільтрів /logs. Повністю читаються
+    лише один раз, далі дочитуються тільки нові записи (id > last_id).
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.admins: dict[int, str | None] = {}
+        self.chats: set[int] = set()
+        self.threads: set[int] = set()
+        self.last_id = 0
+
+    async def refresh(self):
+        def run(cur):
+            last_id = cur.execute("SELECT MAX(id) FROM admin_logs").fetchone()[0] or 0
+            if last_id <= self.last_id:
+                return None
+            admins = cur.execute("""
+                SELECT admin_id, MAX(admin_username) FROM admin_logs
+                WHERE id > ? AND id <= ? AND admin_id IS NOT NULL GROUP BY admin_id
+            """, (self.last_id, last_id)).fetchall()
+            chats = cur.execute("""
+                SELECT DISTINCT chat_id FROM admin_logs
+                WHERE id > ? AND id <= ? AND chat_id IS NOT NULL
+            """, (self.last_id, last_id)).fetchall()
+            threads = cur.execute("""
+                SELECT DISTINCT thread_id FROM admin_logs
+                WHERE id > ? AND id <= ? AND thread_id IS NOT NULL
+            """, (self.last_id, last_id)).fetchall()
+            return last_id, admins, chats, threads
+
+        result = await self.db.read(run)
+        if result is None:
+            return
+        last_id, admins, chats, threads = result
+        for admin_id, username in admins:
+            if username or admin_id not in self.admins:
+                self.admins[admin_id] = username
+        self.chats.update(r[0] for r in chats)
+        self.threads.update(r[0] for r in threads)
+        self.last_id = last_id
+
+    def invalidate(self):
+        """Скидає кеш (після відновлення бази)."""
+        self.admins.clear()
+        self.chats.clear()
+        self.threads.clear()
+        self.last_id = 0
+
+
+# -------------------------------
+# 🔹 Вибірка логів
+# -------------------------------
+def _prefix_range(prefix: str) -> tuple[str, str]:
+    """LIKE 'prefix%' як діапазон рядків: просте порівняння без розбору шаблону."""
+    return prefix, prefix + "\U0010ffff"
+
+
+class LogsQuery:
+    """
+    Фільтри /logs у вигляді діапазонних умов по стовпцях (без date() і
+    LIKE '%...%'), keyset-пагінація по (created_at, id) від новіших.
+    """
+
+    def __init__(self, admin_id: int | None = None, action: str | None = None,
+                 date_from: str | None = None, date_to: str | None = None,
+                 chat_id: int | None = None, thread_id: int | None = None,
+                 published: str | None = None, cursor: str | None = None):
+        where, params = [], []
+        if admin_id:
+            where.append("admin_id=?")
+            params.append(admin_id)
+        if action:
+            where.append("action >= ? AND action < ?")
+            params.extend(_prefix_range(action))
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(date.fromisoformat(date_from).isoformat())
+        if date_to:
+            where.append("created_at < ?")
+            params.append((date.fromisoformat(date_to) + timedelta(days=1)).isoformat())
+        if chat_id:
+            where.append("chat_id=?")
+            params.append(chat_id)
+        if thread_id:
+            where.append("thread_id=?")
+            params.append(thread_id)
+        if published == "yes":
+            where.append("action >= ? AND action < ?")
+            params.extend(_prefix_range("publish"))
+        elif published == "no":
+            where.append("action >= ? AND action < ?")
+            params.extend(_prefix_range("reject"))
+        self.where = where
+        self.params = params
+        self.after = decode_cursor(cursor) if cursor else None
+
+    async def page(self, db, limit: int) -> tuple[list, str | None]:
+        where, params = list(self.where), list(self.params)
+        if self.after is not None:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(self.after)
+        sql = "SELECT id, admin_id, admin_username, action, ad_id, chat_id, thread_id, created_at FROM admin_logs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = await db.fetchall(sql, params)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][7], rows[-1][0])
+        return rows, next_cursor
+
+
+# -------------------------------
+# 🔹 HTML
+# -------------------------------
+PAGE_HEAD = """
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Admin Logs</title>
+    <style>
+        body { font-family: Arial, sans-serif; padding: 20px; }
+        table { border-collapse: collapse; width: 100%; margin-top: 20px; }
+        th, td { border: 1px solid #ccc; padding: 8px; text-align: left; }
+        th { background-color: #f4f4f4; }
+        tr:nth-child(even) { background-color: #fafafa; }
+        .filters { margin-bottom: 20px; }
+        .filters label { margin-right: 10px; }
+        .filters select, .filters input { margin-right: 15px; }
+        .pager { margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <h1>Admin Logs</h1>
+"""
+
+TABLE_HEAD = """
+    <table>
+        <tr>
+            <th>ID</th>
+            <th>Admin ID</th>
+            <th>Username</th>
+            <th>Action</th>
+            <th>Ad ID</th>
+            <th>Chat</th>
+            <th>Thread</th>
+            <th>Time</th>
+        </tr>
+"""
+
+
+def _select(name: str, label: str, options, current) -> str:
+    parts = [f"<label>{label}:<select name='{name}'><option value=''>-- All --</option>"]
+    for value, text in options:
+        selected = "selected" if str(current) == str(value) else ""
+        parts.append(f"<option value='{escape(str(value))}' {selected}>{escape(text)}</option>")
+    parts.append("</select></label>")
+    return "".join(parts)
+
+
+def render_filters(facets: LogFacets, filters: dict) -> str:
+    admins = [(a_id, f"{a_id} (@{a_user})" if a_user else str(a_id)) for a_id, a_user in sorted(facets.admins.items())]
+    chats = [(c, str(c)) for c in sorted(facets.chats)]
+    threads = [(t, str(t)) for t in sorted(facets.threads)]
+    published = filters.get("published")
+    return "".join([
+        "<form method='get' class='filters'>",
+        _select("admin_id", "Admin", admins, filters.get("admin_id")),
+        _select("chat_id", "Chat", chats, filters.get("chat_id")),
+        _select("thread_id", "Thread", threads, filters.get("thread_id")),
+        _select("published", "Status", [("yes", "Published"), ("no", "Rejected")], published),
+        f"<label>Action:<input type='text' name='action' value='{escape(filters.get('action') or '')}'></label>",
+        f"<label>Date from:<input type='date' name='date_from' value='{escape(filters.get('date_from') or '')}'></label>",
+        f"<label>Date to:<input type='date' name='date_to' value='{escape(filters.get('date_to') or '')}'></label>",
+        "<input type='submit' value='Filter'>",
+        "</form>",
+    ])
+
+
+def render_row(r) -> str:
+    cells = (r[0], r[1], f"@{r[2]}" if r[2] else "", r[3], r[4], r[5], r[6], r[7])
+    return "<tr>" + "".join(f"<td>{escape(str(c)) if c is not None else ''}</td>" for c in cells) + "</tr>\n"
+
+
+async def stream_logs_page(db, facets: LogFacets, query: LogsQuery, filters: dict, limit: int):
+    """Віддає сторінку частинами: шапка з фільтрами, рядки таблиці, посилання на наступну сторінку."""
+    await facets.refresh()
+    yield PAGE_HEAD
+    yield render_filters(facets, filters)
+
+    rows, next_cursor = await query.page(db, limit)
+    yield TABLE_HEAD
+    for i in range(0, len(rows), 50):
+        yield "".join(render_row(r) for r in rows[i:i + 50])
+    yield "</table>"
+
+    if next_cursor:
+        params = {k: v for k, v in filters.items() if v not in (None, "")}
+        params["cursor"] = next_cursor
+        params["limit"] = limit
+        yield f"<div class='pager'><a href='?{escape(urlencode(params))}'>Наступна сторінка ➡️</a></div>"
+    yield "</body></html>"
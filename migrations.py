@@ -0,0 +1,321 @@
+import logging
+
+
+def _backfill_ad_photos(cur):
+    # старі оголошення мають лише file_id через кому, без file_unique_id
+    rows = cur.execute("SELECT id, photos FROM ads WHERE photos IS NOT NULL AND photos != ''").fetchall()
+    cur.executemany(
+        "INSERT OR IGNORE INTO ad_photos (ad_id, position, file_id) VALUES (?, ?, ?)",
+        [(ad_id, position, file_id)
+         for ad_id, photos in rows
+         for position, file_id in enumerate(p for p in photos.split(",") if p)]
+    )
+
+
+# -------------------------------
+# 🔹 Міграції схеми
+# -------------------------------
+# Кожна міграція — (версія, опис, список SQL-інструкцій).
+# Поточна версія зберігається у PRAGMA user_version, тож на старті
+# виконуються лише ті кроки, яких ще немає в базі.
+# Нові колонки додаються через ALTER TABLE ... ADD COLUMN (миттєво в SQLite),
+# нові індекси — через CREATE INDEX IF NOT EXISTS.
+MIGRATIONS = [
+    (1, "базова схема", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            accepted_rules BOOLEAN
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            username TEXT,
+            first_name TEXT,
+            category TEXT,
+            district TEXT,
+            title TEXT,
+            description TEXT,
+            photos TEXT,
+            contacts TEXT,
+            is_published INTEGER DEFAULT 0,
+            is_rejected INTEGER DEFAULT 0,
+            is_queued INTEGER DEFAULT 0,
+            rejection_reason TEXT,
+            moder_message_id INTEGER,
+            shares INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS threads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER,
+            thread_id INTEGER,
+            title TEXT,
+            UNIQUE(chat_id, thread_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS admin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER,
+            admin_username TEXT,
+            action TEXT,
+            ad_id INTEGER,
+            chat_id INTEGER,
+            thread_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "індекси для основних запитів", [
+        # my_ads: WHERE user_id=? (з сортуванням за датою)
+        "CREATE INDEX IF NOT EXISTS idx_ads_user_created ON ads(user_id, created_at)",
+        # /stats: WHERE created_at >= ?
+        "CREATE INDEX IF NOT EXISTS idx_ads_created ON ads(created_at)",
+        # autopost: лише оголошення в черзі, відсортовані за датою
+        """
+        CREATE INDEX IF NOT EXISTS idx_ads_queue ON ads(created_at)
+        WHERE is_queued=1 AND is_published=0 AND is_rejected=0
+        """,
+        # пошук гілки за категорією
+        "CREATE INDEX IF NOT EXISTS idx_threads_chat_title ON threads(chat_id, title)",
+        # /logs: ORDER BY created_at DESC + фільтри
+        "CREATE INDEX IF NOT EXISTS idx_admin_logs_created ON admin_logs(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_admin_logs_admin_created ON admin_logs(admin_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_admin_logs_chat_created ON admin_logs(chat_id, created_at)",
+    ]),
+    (3, "збереження FSM-станів", [
+        """
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            state TEXT,
+            data BLOB,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)",
+    ]),
+    (4, "черга публікацій з розкладом і пріоритетами", [
+        """
+        CREATE TABLE IF NOT EXISTS publish_queue (
+            ad_id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            scheduled_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # "наступне готове" для категорії — один прохід по індексу
+        "CREATE INDEX IF NOT EXISTS idx_publish_queue_next ON publish_queue(category, priority DESC, scheduled_at)",
+        # переносимо вже поставлені в чергу оголошення
+        """
+        INSERT OR IGNORE INTO publish_queue (ad_id, category, scheduled_at, enqueued_at)
+        SELECT id, category, created_at, created_at FROM ads
+        WHERE is_queued=1 AND is_published=0 AND is_rejected=0
+        """,
+        # чергу тепер читають з publish_queue; частковий індекс лише сповільнював записи в ads
+        "DROP INDEX IF EXISTS idx_ads_queue",
+    ]),
+    (5, "повнотекстовий пошук опублікованих оголошень", [
+        # Індекс лише з опублікованих оголошень; текст береться з ads (external content)
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5(
+            title, description, category, district,
+            content='ads', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_fts_insert AFTER INSERT ON ads
+        WHEN new.is_published=1
+        BEGIN
+            INSERT INTO ads_fts (rowid, title, description, category, district)
+            VALUES (new.id, new.title, new.description, new.category, new.district);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_fts_publish AFTER UPDATE OF is_published ON ads
+        WHEN new.is_published=1 AND old.is_published=0
+        BEGIN
+            INSERT INTO ads_fts (rowid, title, description, category, district)
+            VALUES (new.id, new.title, new.description, new.category, new.district);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_fts_unpublish AFTER UPDATE OF is_published ON ads
+        WHEN new.is_published=0 AND old.is_published=1
+        BEGIN
+            INSERT INTO ads_fts (ads_fts, rowid, title, description, category, district)
+            VALUES ('delete', old.id, old.title, old.description, old.category, old.district);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_fts_update AFTER UPDATE OF title, description, category, district ON ads
+        WHEN old.is_published=1 AND new.is_published=1
+        BEGIN
+            INSERT INTO ads_fts (ads_fts, rowid, title, description, category, district)
+            VALUES ('delete', old.id, old.title, old.description, old.category, old.district);
+            INSERT INTO ads_fts (rowid, title, description, category, district)
+            VALUES (new.id, new.title, new.description, new.category, new.district);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_fts_delete AFTER DELETE ON ads
+        WHEN old.is_published=1
+        BEGIN
+            INSERT INTO ads_fts (ads_fts, rowid, title, description, category, district)
+            VALUES ('delete', old.id, old.title, old.description, old.category, old.district);
+        END
+        """,
+        # індексуємо вже опубліковані
+        """
+        INSERT INTO ads_fts (rowid, title, description, category, district)
+        SELECT id, title, description, category, district FROM ads WHERE is_published=1
+        """,
+    ]),
+    (6, "індекс для /logs за гілкою", [
+        # префікс дії навмисно без індексу: дій лише кілька, тож прохід по
+        # created_at з фільтром швидше знаходить сторінку, ніж сортування
+        "CREATE INDEX IF NOT EXISTS idx_admin_logs_thread_created ON admin_logs(thread_id, created_at)",
+    ]),
+    (7, "щоденна статистика оголошень", [
+        # Лічильники подій за день (UTC) у розрізі категорії та району
+        """
+        CREATE TABLE IF NOT EXISTS ads_daily_stats (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT '',
+            district TEXT NOT NULL DEFAULT '',
+            created INTEGER NOT NULL DEFAULT 0,
+            published INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            shares INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, category, district)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_stats_insert AFTER INSERT ON ads
+        BEGIN
+            INSERT INTO ads_daily_stats (day, category, district, created)
+            VALUES (COALESCE(date(new.created_at), date('now')), COALESCE(new.category, ''), COALESCE(new.district, ''), 1)
+            ON CONFLICT(day, category, district) DO UPDATE SET created=created+excluded.created;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_stats_publish AFTER UPDATE OF is_published ON ads
+        WHEN new.is_published=1 AND old.is_published=0
+        BEGIN
+            INSERT INTO ads_daily_stats (day, category, district, published)
+            VALUES (date('now'), COALESCE(new.category, ''), COALESCE(new.district, ''), 1)
+            ON CONFLICT(day, category, district) DO UPDATE SET published=published+excluded.published;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_stats_reject AFTER UPDATE OF is_rejected ON ads
+        WHEN new.is_rejected=1 AND old.is_rejected=0
+        BEGIN
+            INSERT INTO ads_daily_stats (day, category, district, rejected)
+            VALUES (date('now'), COALESCE(new.category, ''), COALESCE(new.district, ''), 1)
+            ON CONFLICT(day, category, district) DO UPDATE SET rejected=rejected+excluded.rejected;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ads_stats_shares AFTER UPDATE OF shares ON ads
+        WHEN new.shares > old.shares
+        BEGIN
+            INSERT INTO ads_daily_stats (day, category, district, shares)
+            VALUES (date('now'), COALESCE(new.category, ''), COALESCE(new.district, ''), new.shares - old.shares)
+            ON CONFLICT(day, category, district) DO UPDATE SET shares=shares+excluded.shares;
+        END
+        """,
+        # переносимо наявні оголошення (події до цього моменту — за днем створення)
+        """
+        INSERT INTO ads_daily_stats (day, category, district, created, published, rejected, shares)
+        SELECT date(created_at), COALESCE(category, ''), COALESCE(district, ''),
+               COUNT(*), SUM(is_published), SUM(is_rejected), SUM(COALESCE(shares, 0))
+        FROM ads
+        WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        """,
+    ]),
+    (8, "прийняті апдейти для відсіювання повторів", [
+        """
+        CREATE TABLE IF NOT EXISTS seen_updates (
+            key TEXT PRIMARY KEY,
+            seen_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_seen_updates_seen_at ON seen_updates(seen_at)",
+    ]),
+    (9, "фото оголошень в окремій таблиці", [
+        """
+        CREATE TABLE IF NOT EXISTS ad_photos (
+            ad_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            PRIMARY KEY (ad_id, position)
+        ) WITHOUT ROWID
+        """,
+        # однакові фото в різних оголошеннях
+        "CREATE INDEX IF NOT EXISTS idx_ad_photos_unique ON ad_photos(file_unique_id)",
+        _backfill_ad_photos,
+    ]),
+    (10, "підписи тексту для пошуку схожих оголошень", [
+        # підписи для старих оголошень дораховує DuplicateIndex.start()
+        """
+        CREATE TABLE IF NOT EXISTS ad_signatures (
+            ad_id INTEGER PRIMARY KEY,
+            exact TEXT NOT NULL,
+            sig BLOB NOT NULL
+        )
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def apply_migrations(cur) -> int:
+    """Доводить схему бази курсора cur до LATEST_VERSION; повертає версію."""
+    # Перевіряємо версію ще раз уже під блокуванням письменника
+    current = cur.execute("PRAGMA user_version").fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"🛠 Міграція БД до версії {version}: {description}")
+        cur.execute("BEGIN IMMEDIATE")
+        for sql in statements:
+            if callable(sql):
+                sql(cur)
+            else:
+                cur.execute(sql)
+        cur.execute(f"PRAGMA user_version = {int(version)}")
+        cur.connection.commit()
+        current = version
+    return current
+
+
+async def migrate(db) -> int:
+    """
+    Доводить схему до LATEST_VERSION. Якщо версія вже актуальна,
+    виконується лише одне читання PRAGMA user_version.
+    """
+    current = (await db.fetchone("PRAGMA user_version"))[0]
+    if current >= LATEST_VERSION:
+        return current
+    return await db.transaction(apply_migrations)
@@ -0,0 +1,31 @@
+# -------------------------------
+# 🔹 Фото оголошень
+# -------------------------------
+# Фото зберігаються в ad_photos по рядку на фото; для Ad вони збираються
+# одним підзапитом по первинному ключу (ad_id, position)
+PHOTOS_SQL = (
+    "(SELECT group_concat(file_id) FROM "
+    "(SELECT file_id FROM ad_photos WHERE ad_id=ads.id ORDER BY position))"
+)
+
+
+def save_photos(cur, ad_id: int, photos: dict[str, str]):
+    """Зберігає фото оголошення; photos — {file_unique_id: file_id} у порядку додавання."""
+    cur.executemany(
+        "INSERT INTO ad_photos (ad_id, position, file_id, file_unique_id) VALUES (?, ?, ?, ?)",
+        [(ad_id, position, file_id, unique_id) for position, (unique_id, file_id) in enumerate(photos.items())]
+    )
+
+
+async def find_reused(db, unique_ids, user_id: int, limit: int = 5) -> list[int]:
+    """Оголошення інших користувачів з тими самими фото (пошук по індексу file_unique_id)."""
+    unique_ids = list(unique_ids)
+    if not unique_ids:
+        return []
+    placeholders = ",".join("?" * len(unique_ids))
+    rows = await db.fetchall(f"""
+        SELECT DISTINCT p.ad_id FROM ad_photos p JOIN ads a ON a.id = p.ad_id
+        WHERE p.file_unique_id IN ({placeholders}) AND a.user_id != ?
+        ORDER BY p.ad_id DESC LIMIT ?
+    """, (*unique_ids, user_id, limit))
+    return [r[0] for r in rows]
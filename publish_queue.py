@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timezone
+
+
+def db_timestamp(dt: datetime | None = None) -> str:
+    """Час у форматі CURRENT_TIMESTAMP SQLite (UTC)."""
+    dt = dt or datetime.now(timezone.utc)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# -------------------------------
+# 🔹 Черга публікацій
+# -------------------------------
+class PublishQueue:
+    """
+    Черга публікацій з окремою таблицею publish_queue: кожен запис має
+    час публікації (scheduled_at) і пріоритет. Вибірка наступних оголошень
+    іде по індексу (category, priority, scheduled_at) окремо для кожної
+    категорії, а категорії обходяться по колу — зайнята категорія не
+    витісняє інші. Між публікаціями в одній гілці витримується min_spacing секунд.
+    """
+
+    def __init__(self, db, min_spacing: int = 0):
+        self.db = db
+        self.min_spacing = min_spacing
+        self._last_published: dict[str, float] = {}
+        self._rr = 0
+
+    async def enqueue(self, ad_id: int, category: str, scheduled_at: datetime | None = None, priority: int = 0):
+        when = db_timestamp(scheduled_at)
+
+        def run(cur):
+            cur.execute("""
+                INSERT INTO publish_queue (ad_id, category, priority, scheduled_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(ad_id) DO UPDATE SET
+                    category=excluded.category, priority=excluded.priority, scheduled_at=excluded.scheduled_at
+            """, (ad_id, category, priority, when))
+            cur.execute("UPDATE ads SET is_queued=1 WHERE id=?", (ad_id,))
+        await self.db.transaction(run)
+
+    async def remove(self, ad_id: int):
+        await self.db.execute("DELETE FROM publish_queue WHERE ad_id=?", (ad_id,))
+
+    def mark_published(self, category: str):
+        self._last_published[category] = time.time()
+
+    async def take_due(self, categories, limit: int) -> list[int]:
+        """
+        Повертає до limit ad_id, готових до публікації, у справедливому порядку:
+        по одному з кожної категорії по колу, починаючи щоразу з наступної.
+        """
+        categories = list(categories)
+        if not categories or limit <= 0:
+            return []
+        start = self._rr % len(categories)
+        categories = categories[start:] + categories[:start]
+        self._rr += 1
+
+        now = time.time()
+        now_ts = db_timestamp()
+        # Якщо витримується інтервал між постами, з категорії за раз береться одне оголошення
+        per_category = 1 if self.min_spacing > 0 else limit
+
+        def run(cur):
+            lanes = []
+            for category in categories:
+                if now - self._last_published.get(category, 0) < self.min_spacing:
+                    continue
+                rows = cur.execute("""
+                    SELECT ad_id FROM publish_queue
+                    WHERE category=? AND scheduled_at <= ?
+                    ORDER BY priority DESC, scheduled_at ASC
+                    LIMIT ?
+                """, (category, now_ts, per_category)).fetchall()
+                if rows:
+                    lanes.append([r[0] for r in rows])
+            return lanes
+
+        lanes = await self.db.read(run)
+
+        result = []
+        depth = 0
+        while len(result) < limit and any(depth < len(lane) for lane in lanes):
+            for lane in lanes:
+                if depth < len(lane) and len(result) < limit:
+                    result.append(lane[depth])
+            depth += 1
+        return result
+
+    async def stats(self) -> dict:
+        now_ts = db_timestamp()
+        rows = await self.db.fetchall("""
+            SELECT category, COUNT(*), SUM(scheduled_at <= ?)
+            FROM publish_queue GROUP BY category
+        """, (now_ts,))
+        return {category: {"queued": total, "due": due or 0} for category, total, due in rows}
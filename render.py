@@ -0,0 +1,309 @@
+from collections import OrderedDict
+from typing import NamedTuple
+
+from aiogram import types
+from aiogram.types import (
+    ReplyKeyboardMarkup,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+
+from photos import PHOTOS_SQL
+from routing import pack, PUBLISH, QUEUE, REJECT, BLACKLIST, MY_AD, MY_ADS_PAGE
+
+
+# -------------------------------
+# 🔹 Готові клавіатури
+# -------------------------------
+# Будуються один раз при імпорті і далі лише перевикористовуються
+MAIN_MENU_KB = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення", "ℹ️ FAQ", "📋 Мої оголошення")
+SUBMIT_MENU_KB = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення", "📋 Мої оголошення")
+SUBMIT_ONLY_KB = ReplyKeyboardMarkup(resize_keyboard=True).add("📢 Подати оголошення")
+
+
+def get_user_button(user_id: int, username: str | None):
+    if username:
+        return InlineKeyboardButton(f"👤 @{username}", url=f"https://t.me/{username}")
+    else:
+        return InlineKeyboardButton("👤 Профіль", url=f"tg://user?id={user_id}")
+
+
+def get_moder_keyboard(ad_id: int, user_id: int, username: str | None):
+    kb = InlineKeyboardMarkup(row_width=2)
+
+    kb.add(
+        InlineKeyboardButton("✅ Опублікувати зараз", callback_data=pack(PUBLISH, ad_id)),
+        InlineKeyboardButton("⏳ Додати в чергу", callback_data=pack(QUEUE, ad_id)),
+        InlineKeyboardButton("❌ Відхилити", callback_data=pack(REJECT, ad_id)),
+        InlineKeyboardButton("🚫 Чорний список", callback_data=pack(BLACKLIST, ad_id))
+    )
+    kb.add(get_user_button(user_id, username))
+    return kb
+
+
+def get_publish_keyboard(ad_id: int, user_id: int, username: str | None):
+    kb = InlineKeyboardMarkup()
+    kb.add(get_user_button(user_id, username))
+    kb.add(InlineKeyboardButton("🔗 Поділитися", switch_inline_query=str(ad_id)))
+    return kb
+
+
+# -------------------------------
+# 🔹 Оголошення та його представлення
+# -------------------------------
+AD_COLUMNS = (
+    "id, user_id, username, first_name, category, district, title, description, "
+    f"{PHOTOS_SQL} AS photos, contacts, is_published, is_rejected, is_queued"
+)
+
+
+def ad_status(is_published, is_rejected) -> str:
+    if is_published:
+        return "опубліковано"
+    elif is_rejected:
+        return "відхилено"
+    return "в черзі"
+
+
+class Ad(NamedTuple):
+    id: int
+    user_id: int
+    username: str | None
+    first_name: str | None
+    category: str
+    district: str
+    title: str
+    description: str
+    photos: str | None
+    contacts: str
+    is_published: int = 0
+    is_rejected: int = 0
+    is_queued: int = 0
+
+    @property
+    def photo_list(self) -> tuple[str, ...]:
+        return tuple(p for p in (self.photos or "").split(",") if p)
+
+    @property
+    def status(self) -> str:
+        return ad_status(self.is_published, self.is_rejected)
+
+
+class Payload(NamedTuple):
+    text: str
+    photos: tuple[str, ...] = ()
+    reply_markup: InlineKeyboardMarkup | None = None
+    parse_mode: str | None = None
+    # короткий текст для повідомлення з кнопками, коли основний текст пішов підписом до альбому
+    buttons_text: str | None = None
+
+
+def render_publish(ad: Ad) -> Payload:
+    text = (
+        f"📢 ОГОЛОШЕННЯ #{ad.id}\n\n"
+        f"👤 Користувач: {ad.first_name or ''} (@{ad.username})\n\n"
+        f"🔹 Категорія: {ad.category}\n"
+        f"📍 Район: {ad.district}\n"
+        f"🏷 Заголовок: {ad.title}\n"
+        f"📝 Опис: {ad.description}\n"
+        f"📞 Контакти: {ad.contacts}\n"
+    )
+    return Payload(text, ad.photo_list, get_publish_keyboard(ad.id, ad.user_id, ad.username),
+                   buttons_text=f"⬆️ Оголошення #{ad.id}")
+
+
+def render_moder(ad: Ad) -> Payload:
+    text = (
+        f"📢 НОВЕ ОГОЛОШЕННЯ #{ad.id}\n\n"
+        f"👤 Користувач: {ad.first_name or ''} "
+        f"(@{ad.username}) [ID: {ad.user_id}]\n\n"
+        f"🔹 Категорія: {ad.category}\n"
+        f"📍 Район: {ad.district}\n"
+        f"🏷 Заголовок: {ad.title}\n"
+        f"📝 Опис: {ad.description}\n"
+        f"📞 Контакти: {ad.contacts}\n"
+    )
+    return Payload(text, ad.photo_list, get_moder_keyboard(ad.id, ad.user_id, ad.username),
+                   buttons_text=f"⬆️ Оголошення #{ad.id}")
+
+
+def render_owner(ad: Ad) -> Payload:
+    text = (
+        f"📢 ОГОЛОШЕННЯ #{ad.id}\n\n"
+        f"🔹 Категорія: {ad.category}\n"
+        f"📍 Район: {ad.district}\n"
+        f"🏷 Заголовок: {ad.title}\n"
+        f"📝 Опис: {ad.description}\n"
+        f"📞 Контакти: {ad.contacts}\n"
+        f"Статус: {ad.status}\n"
+    )
+    # власнику показуємо лише перше фото
+    return Payload(text, ad.photo_list[:1])
+
+
+def render_share(ad: Ad) -> str:
+    return (
+        f"📢 ОГОЛОШЕННЯ #{ad.id}\n\n"
+        f"🏷 {ad.title}\n"
+        f"📝 {ad.description}\n"
+        f"📞 {ad.contacts}\n"
+    )
+
+
+def render_inline(ad: Ad) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=str(ad.id),
+        title=f"Поділитися оголошенням #{ad.id}",
+        description=ad.title,
+        input_message_content=InputTextMessageContent(render_share(ad))
+    )
+
+
+def render_my_ads_page(rows, has_prev: bool, has_next: bool) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Коротке зведення сторінки "Мої оголошення": рядок на оголошення,
+    кнопка для перегляду кожного і навігація ⬅️/➡️ (курсор — id крайнього рядка).
+    rows — (id, title, is_published, is_rejected).
+    """
+    lines = ["📋 Ваші оголошення:\n"]
+    kb = InlineKeyboardMarkup(row_width=5)
+    buttons = []
+    for ad_id, title, is_published, is_rejected in rows:
+        short = title if len(title) <= 40 else title[:39] + "…"
+        lines.append(f"#{ad_id} · {short} — {ad_status(is_published, is_rejected)}")
+        buttons.append(InlineKeyboardButton(f"#{ad_id}", callback_data=pack(MY_AD, ad_id)))
+    kb.add(*buttons)
+
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Новіші", callback_data=pack(MY_ADS_PAGE, "prev", rows[0][0])))
+    if has_next:
+        nav.append(InlineKeyboardButton("Старіші ➡️", callback_data=pack(MY_ADS_PAGE, "next", rows[-1][0])))
+    if nav:
+        kb.row(*nav)
+    return "\n".join(lines), kb
+
+
+# -------------------------------
+# 🔹 Кеш оголошень
+# -------------------------------
+class AdRenderer:
+    """
+    LRU-кеш оголошень і вже зібраних повідомлень для них.
+    Запис скидається через invalidate() при будь-якій зміні статусу оголошення.
+    """
+
+    def __init__(self, db, max_size: int = 1024):
+        self.db = db
+        self.max_size = max_size
+        self._cache: OrderedDict[int, dict] = OrderedDict()
+
+    def _entry(self, ad: Ad) -> dict:
+        entry = self._cache.get(ad.id)
+        if entry is None or entry["ad"] != ad:
+            entry = {"ad": ad}
+            self._cache[ad.id] = entry
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(ad.id)
+        return entry
+
+    async def get_ad(self, ad_id: int) -> Ad | None:
+        entry = self._cache.get(ad_id)
+        if entry is not None:
+            self._cache.move_to_end(ad_id)
+            return entry["ad"]
+        row = await self.db.fetchone(f"SELECT {AD_COLUMNS} FROM ads WHERE id=?", (ad_id,))
+        if not row:
+            return None
+        return self._entry(Ad(*row))["ad"]
+
+    def _render(self, ad: Ad, kind: str, fn):
+        entry = self._entry(ad)
+        payload = entry.get(kind)
+        if payload is None:
+            payload = entry[kind] = fn(ad)
+        return payload
+
+    def publish(self, ad: Ad) -> Payload:
+        return self._render(ad, "publish", render_publish)
+
+    def moder(self, ad: Ad) -> Payload:
+        return self._render(ad, "moder", render_moder)
+
+    def owner(self, ad: Ad) -> Payload:
+        return self._render(ad, "owner", render_owner)
+
+    def inline(self, ad: Ad) -> InlineQueryResultArticle:
+        return self._render(ad, "inline", render_inline)
+
+    def invalidate(self, ad_id: int):
+        self._cache.pop(ad_id, None)
+
+    def clear(self):
+        self._cache.clear()
+
+
+# -------------------------------
+# 🔹 Відправка
+# -------------------------------
+CAPTION_LIMIT = 1024
+ALBUM_LIMIT = 10
+
+
+def chunk_photos(photos, size: int = ALBUM_LIMIT) -> list[tuple[str, ...]]:
+    """
+    Ділить фото на мінімальну кількість альбомів, вирівнюючи їх розмір:
+    11 фото — 6 + 5, а не 10 + 1 (альбом має містити щонайменше 2 фото).
+    """
+    photos = tuple(photos)
+    if not photos:
+        return []
+    count = -(-len(photos) // size)
+    base, extra = divmod(len(photos), count)
+    chunks, start = [], 0
+    for i in range(count):
+        end = start + base + (1 if i < extra else 0)
+        chunks.append(photos[start:end])
+        start = end
+    return chunks
+
+
+async def send_payload(sender, chat_id: int, payload: Payload, thread_id: int | None = None, priority: int = 0):
+    """
+    Єдиний шлях відправки оголошення з найменшою кількістю викликів API:
+    одне фото з підписом; або альбоми по 10 фото з текстом у підписі першого
+    (плюс коротке повідомлення з кнопками, якщо вони є); або просто текст.
+    Повертає повідомлення з кнопками (або перше повідомлення, якщо кнопок немає).
+    """
+    thread = {"message_thread_id": thread_id} if thread_id is not None else {}
+    extra = {"priority": priority, "reply_markup": payload.reply_markup, **thread}
+    if payload.parse_mode:
+        extra["parse_mode"] = payload.parse_mode
+
+    photos = payload.photos
+    fits_caption = len(payload.text) <= CAPTION_LIMIT
+    if not photos:
+        return await sender.send_message(chat_id=chat_id, text=payload.text, **extra)
+    if len(photos) == 1 and fits_caption:
+        return await sender.send_photo(chat_id=chat_id, photo=photos[0], caption=payload.text, **extra)
+
+    first = None
+    for i, chunk in enumerate(chunk_photos(photos)):
+        if len(chunk) == 1:
+            sent = await sender.send_photo(chat_id=chat_id, photo=chunk[0], priority=priority, **thread)
+        else:
+            media = [types.InputMediaPhoto(p) for p in chunk]
+            if i == 0 and fits_caption:
+                media[0] = types.InputMediaPhoto(chunk[0], caption=payload.text, parse_mode=payload.parse_mode)
+            sent = (await sender.send_media_group(chat_id=chat_id, media=media, priority=priority, **thread))[0]
+        first = first or sent
+
+    if not fits_caption:
+        return await sender.send_message(chat_id=chat_id, text=payload.text, **extra)
+    if payload.reply_markup is not None:
+        extra.pop("parse_mode", None)
+        return await sender.send_message(chat_id=chat_id, text=payload.buttons_text or payload.text, **extra)
+    return first
@@ -0,0 +1,131 @@
+import inspect
+
+from aiogram import Dispatcher, types
+
+
+# -------------------------------
+# 🔹 Формат callback_data
+# -------------------------------
+# Поточний формат: "1:<дія>:<арг>:<арг>..." — версія, коротка назва дії,
+# аргументи. Кнопки у вже надісланих повідомленнях мають старий формат
+# "<дія>_<арг>_<арг>", тому він теж розбирається (через LEGACY_ACTIONS).
+CALLBACK_VERSION = "1"
+CALLBACK_LIMIT = 64  # обмеження Telegram, байт
+
+PUBLISH = "pub"
+QUEUE = "q"
+REJECT = "rej"
+REJECT_REASON = "rsn"
+BLACKLIST = "bl"
+UNBLACKLIST = "ubl"
+MY_AD = "my"
+MY_ADS_PAGE = "myp"
+
+LEGACY_ACTIONS = {
+    "publish": PUBLISH,
+    "queue": QUEUE,
+    "reject": REJECT,
+    "reason": REJECT_REASON,
+    "blacklist": BLACKLIST,
+    "unblacklist": UNBLACKLIST,
+    "myad": MY_AD,
+    "myads": MY_ADS_PAGE,
+}
+
+
+def pack(action: str, *args) -> str:
+    data = ":".join((CALLBACK_VERSION, action, *map(str, args)))
+    if len(data.encode()) > CALLBACK_LIMIT:
+        raise ValueError(f"callback_data довша за {CALLBACK_LIMIT} байт: {data}")
+    return data
+
+
+def unpack(data: str | None) -> tuple[str, list[str]] | None:
+    """(дія, аргументи) для нового і старого форматів; None — невідомий формат."""
+    if not data:
+        return None
+    version, sep, rest = data.partition(":")
+    if sep:
+        if version != CALLBACK_VERSION:
+            return None
+        action, *args = rest.split(":")
+        return action, args
+    head, *args = data.split("_")
+    action = LEGACY_ACTIONS.get(head)
+    return (action, args) if action else None
+
+
+# -------------------------------
+# 🔹 Маршрутизація кнопок
+# -------------------------------
+def _accepted_kwargs(fn):
+    params = inspect.signature(fn).parameters.values()
+    if any(p.kind is p.VAR_KEYWORD for p in params):
+        return None
+    return {p.name for p in params}
+
+
+class Router:
+    """
+    Хендлери для тексту кнопок клавіатури і для дій callback_data,
+    зареєстровані в словниках. У aiogram реєструється по одному хендлеру
+    на повідомлення і на callback: фільтр — один пошук у словнику, тож
+    вартість маршрутизації не росте з кількістю кнопок і дій.
+    """
+
+    def __init__(self):
+        self._texts: dict[str, tuple] = {}
+        self._callbacks: dict[str, tuple] = {}
+
+    def text(self, *texts: str):
+        def decorator(fn):
+            for text in texts:
+                self._texts[text] = (fn, _accepted_kwargs(fn))
+            return fn
+        return decorator
+
+    def callback(self, action: str, *converters):
+        """converters — типи аргументів, що передаються хендлеру після callback_query."""
+        def decorator(fn):
+            self._callbacks[action] = (fn, converters, _accepted_kwargs(fn))
+            return fn
+        return decorator
+
+    def setup(self, dp: Dispatcher):
+        # стан не вказано — як і для звичайних хендлерів, лише поза формою
+        dp.register_message_handler(self._on_text, self._match_text)
+        dp.register_callback_query_handler(self._on_callback, self._match_callback)
+
+    @staticmethod
+    def _call(fn, accepted, obj, args, kwargs):
+        if accepted is not None:
+            kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+        return fn(obj, *args, **kwargs)
+
+    # --- текст кнопок ---
+    def _match_text(self, message: types.Message) -> bool:
+        return message.text in self._texts
+
+    async def _on_text(self, message: types.Message, **kwargs):
+        fn, accepted = self._texts[message.text]
+        return await self._call(fn, accepted, message, (), kwargs)
+
+    # --- callback_data ---
+    def _match_callback(self, callback_query: types.CallbackQuery):
+        parsed = unpack(callback_query.data)
+        if parsed is None:
+            return False
+        action, raw = parsed
+        route = self._callbacks.get(action)
+        if route is None or len(raw) != len(route[1]):
+            return False
+        try:
+            args = tuple(conv(value) for conv, value in zip(route[1], raw))
+        except ValueError:
+            return False
+        # результат фільтра aiogram передає в дані хендлера
+        return {"route": (route, args)}
+
+    async def _on_callback(self, callback_query: types.CallbackQuery, route, **kwargs):
+        (fn, _, accepted), args = route
+        return await self._call(fn, accepted, callback_query, args, kwargs)
@@ -1,121 +1,129 @@
-import os
 import logging
 import asyncio
-import sqlite3
-from dotenv import load_dotenv
-from pathlib import Path
-from aiogram import Bot, types
-from aiogram.types import (
-    ReplyKeyboardMarkup,
-    InlineKeyboardMarkup,
-    InlineKeyboardButton,
-)
-
-env_path = Path(__file__).parent / ".env"
-load_dotenv(dotenv_path=env_path)
-
-TOKEN = os.getenv("BOT_TOKEN")
-PUBLISH_CHAT_ID = int(os.getenv("PUBLISH_CHAT_ID"))
-DB_PATH = "bot.db"
-
-bot = Bot(token=TOKEN, parse_mode="HTML")
-logging.basicConfig(level=logging.INFO)
-
-
-async def autopost_once():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT id, user_id, username, first_name, category, district, title, description, photos, contacts
-        FROM ads
-        WHERE is_queued=1 AND is_published=0 AND is_rejected=0
-        ORDER BY created_at ASC
-        LIMIT 1
-    """)
-    ad = cursor.fetchone()
-
-    if ad:
-        ad_id, user_id, username, first_name, category, district, title, description, photos, contacts = ad
-
-        # thread_id шукаємо для категорії
-        cursor.execute(
-            "SELECT thread_id FROM threads WHERE chat_id=? AND title=?",
-            (PUBLISH_CHAT_ID, category)
-        )
-        row = cursor.fetchone()
-
-        if not row:
-            logging.warning(f"❌ Категорія '{category}' не привʼязана до публічного чату")
-        else:
-            thread_id = row[0]
-
-            pub_text = (
-                f"📢 ОГОЛОШЕННЯ #{ad_id}\n\n"
-                f"👤 Користувач: {first_name or ''} (@{username})\n\n"
-                f"🔹 Категорія: {category}\n"
-                f"📍 Район: {district}\n"
-                f"🏷 Заголовок: {title}\n"
-                f"📝 Опис: {description}\n"
-                f"📞 Контакти: {contacts}\n"
-            )
-
-            pub_kb = InlineKeyboardMarkup()
-            if username:
-                pub_kb.add(InlineKeyboardButton(f"👤 @{username}", url=f"https://t.me/{username}"))
-            else:
-                pub_kb.add(InlineKeyboardButton("👤 Профіль", url=f"tg://user?id={user_id}"))
-            pub_kb.add(InlineKeyboardButton("🔗 Поділитися", switch_inline_query=str(ad_id)))
-
-            try:
-                if photos:
-                    photos = photos.split(",")
-                    if len(photos) == 1:
-                        await bot.send_photo(
-                            chat_id=PUBLISH_CHAT_ID,
-                            message_thread_id=thread_id,
-                            photo=photos[0],
-                            caption=pub_text,
-                            reply_markup=pub_kb
-                        )
-                    else:
-                        media = [types.InputMediaPhoto(p) for p in photos[:10]]
-                        await bot.send_media_group(chat_id=PUBLISH_CHAT_ID, message_thread_id=thread_id, media=media)
-                        await bot.send_message(
-                            chat_id=PUBLISH_CHAT_ID,
-                            message_thread_id=thread_id,
-                            text=pub_text,
-                            reply_markup=pub_kb
-                        )
+from contextlib import asynccontextmanager
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from sender import PRIORITY_BULK
+from render import Ad, AD_COLUMNS, SUBMIT_MENU_KB, send_payload
+
+
+# -------------------------------
+# 🔹 Автопостинг
+# -------------------------------
+class AutopostEngine:
+    """
+    Публікує оголошення з черги всередині процесу бота: працює на тому ж
+    event loop, використовує той самий Bot (HTTP-сесію), Database і чергу
+    відправки. За один запуск публікує до batch_size оголошень, які
+    PublishQueue видає по черзі з усіх категорій. Запуски за розкладом
+    додаються в спільний scheduler бота.
+    """
+
+    def __init__(self, db, sender, categories, queue, renderer, publish_chat_id: int,
+                 scheduler: AsyncIOScheduler, interval: int = 3600, batch_size: int = 10):
+        self.db = db
+        self.sender = sender
+        self.categories = categories
+        self.queue = queue
+        self.renderer = renderer
+        self.publish_chat_id = publish_chat_id
+        self.interval = interval
+        self.batch_size = batch_size
+        self.scheduler = scheduler
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        self.scheduler.add_job(self.tick, "interval", seconds=self.interval,
+                               max_instances=1, coalesce=True, id="autopost")
+        logging.info(f"⏰ Автопостинг: кожні {self.interval} с, до {self.batch_size} оголошень")
+
+    @asynccontextmanager
+    async def paused(self):
+        """Дочікується поточного запуску і не дає почати новий до кінця блоку."""
+        async with self._lock:
+            yield
+
+    async def tick(self) -> int:
+        """Публікує наступну порцію оголошень з черги. Повертає кількість опублікованих."""
+        async with self._lock:
+            titles = self.categories.titles(self.publish_chat_id)
+            if not titles:
+                logging.warning("❌ Жодна категорія не привʼязана до публічного чату")
+                return 0
+
+            # беремо лише ті категорії, які можна опублікувати, щоб
+            # неприв'язана категорія не блокувала чергу
+            ad_ids = await self.queue.take_due(titles, self.batch_size)
+            if not ad_ids:
+                return 0
+
+            placeholders = ",".join("?" * len(ad_ids))
+            rows = await self.db.fetchall(f"""
+                SELECT {AD_COLUMNS}
+                FROM ads
+                WHERE id IN ({placeholders}) AND is_published=0 AND is_rejected=0
+            """, ad_ids)
+            by_id = {row[0]: Ad(*row) for row in rows}
+
+            ads = []
+            for ad_id in ad_ids:
+                if ad_id in by_id:
+                    ads.append(by_id[ad_id])
                 else:
-                    await bot.send_message(
-                        chat_id=PUBLISH_CHAT_ID,
-                        message_thread_id=thread_id,
-                        text=pub_text,
-                        reply_markup=pub_kb
-                    )
-
-                # позначаємо як опубліковане
-                cursor.execute("UPDATE ads SET is_published=1, is_queued=0 WHERE id=?", (ad_id,))
-                conn.commit()
-
-                kb = ReplyKeyboardMarkup(resize_keyboard=True).add(
-                    "📢 Подати оголошення", "📋 Мої оголошення"
-                )
-                await bot.send_message(user_id, "✅ Ваше оголошення успішно опубліковане!", reply_markup=kb)
-
-            except Exception as e:
-                logging.exception(f"❌ Помилка при публікації #{ad_id}: {e}")
-
-    conn.close()            
-
-async def main():
-    try:
-        await autopost_once()
-    finally:
-        session = await bot.get_session()
-        if session and not session.closed:
-            await session.close()
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+                    # вже опубліковане/відхилене або видалене — прибираємо з черги
+                    await self.queue.remove(ad_id)
+
+            published = 0
+            for ad in ads:
+                try:
+                    if await self.publish(ad) is not None:
+                        published += 1
+                except Exception as e:
+                    logging.exception(f"❌ Помилка при публікації #{ad.id}: {e}")
+            if ads:
+                logging.info(f"📤 Автопостинг: опубліковано {published} з {len(ads)}")
+            return published
+
+    async def publish(self, ad: Ad) -> int | None:
+        """
+        Публікує оголошення в його гілку, позначає опублікованим і сповіщає автора.
+        Повертає thread_id або None, якщо категорія не прив'язана до публічного
+        чату чи оголошення вже опубліковане (відхилене) іншим запуском.
+        """
+        thread_id = self.categories.thread_id(self.publish_chat_id, ad.category)
+        if thread_id is None:
+            logging.warning(f"❌ Категорія '{ad.category}' не привʼязана до публічного чату")
+            return None
+
+        # займаємо оголошення ще до відправки: кнопка модератора і автопостинг
+        # не опублікують його двічі
+        def claim(cur):
+            cur.execute("UPDATE ads SET is_published=1 WHERE id=? AND is_published=0 AND is_rejected=0", (ad.id,))
+            return cur.rowcount
+        if not await self.db.transaction(claim):
+            logging.info(f"ℹ️ Оголошення #{ad.id} вже опубліковане або відхилене")
+            return None
+
+        try:
+            await send_payload(self.sender, self.publish_chat_id, self.renderer.publish(ad), thread_id, PRIORITY_BULK)
+        except Exception:
+            # не відправилось — повертаємо оголошення в неопубліковані
+            await self.db.execute("UPDATE ads SET is_published=0 WHERE id=?", (ad.id,))
+            raise
+
+        # опубліковане — прибираємо з черги
+        def mark(cur):
+            cur.execute("UPDATE ads SET is_queued=0 WHERE id=?", (ad.id,))
+            cur.execute("DELETE FROM publish_queue WHERE ad_id=?", (ad.id,))
+        await self.db.transaction(mark)
+        self.renderer.invalidate(ad.id)
+        self.queue.mark_published(ad.category)
+
+        # оголошення вже опубліковане: помилка сповіщення (наприклад, автор
+        # заблокував бота) лише логується
+        try:
+            await self.sender.send_message(ad.user_id, "✅ Ваше оголошення успішно опубліковане!",
+                                           reply_markup=SUBMIT_MENU_KB)
+        except Exception as e:
+            logging.warning(f"⚠️ Не вдалося сповістити автора оголошення #{ad.id}: {e}")
+        return thread_id
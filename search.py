@@ -0,0 +1,84 @@
+import re
+import time
+from collections import OrderedDict
+
+from render import Ad, AD_COLUMNS
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+
+def fts_query(text: str) -> str:
+    """
+    Перетворює довільний текст користувача на безпечний запит FTS5:
+    кожне слово — окремий префіксний термін, усі терміни мають збігтися.
+    """
+    terms = WORD_RE.findall(text.casefold())[:MAX_TERMS]
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+# -------------------------------
+# 🔹 Пошук оголошень
+# -------------------------------
+class AdSearch:
+    """
+    Пошук опублікованих оголошень по індексу ads_fts з кешем результатів.
+    Для кожного запиту один раз вибирається до max_results найрелевантніших
+    оголошень і рендериться у результати inline-режиму; наступні сторінки
+    (next_offset) віддаються з кешу без звернення до бази.
+    """
+
+    def __init__(self, db, renderer, page_size: int = 20, max_results: int = 100,
+                 max_size: int = 256, ttl: float = 60):
+        self.db = db
+        self.renderer = renderer
+        self.page_size = page_size
+        self.max_results = max_results
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache: OrderedDict[str, tuple[float, list]] = OrderedDict()
+
+    async def _fetch(self, query: str) -> list[Ad]:
+        def run(cur):
+            ids = [r[0] for r in cur.execute(
+                "SELECT rowid FROM ads_fts WHERE ads_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, self.max_results)
+            )]
+            if not ids:
+                return []
+            placeholders = ",".join("?" * len(ids))
+            rows = cur.execute(
+                f"SELECT {AD_COLUMNS} FROM ads WHERE id IN ({placeholders}) AND is_published=1", ids
+            ).fetchall()
+            by_id = {row[0]: Ad(*row) for row in rows}
+            return [by_id[i] for i in ids if i in by_id]
+
+        return await self.db.read(run)
+
+    async def _results(self, query: str) -> list:
+        now = time.monotonic()
+        cached = self._cache.get(query)
+        if cached is not None and cached[0] > now:
+            self._cache.move_to_end(query)
+            return cached[1]
+
+        results = [self.renderer.inline(ad) for ad in await self._fetch(query)]
+        self._cache[query] = (now + self.ttl, results)
+        self._cache.move_to_end(query)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return results
+
+    async def search(self, text: str, offset: str = "") -> tuple[list, str]:
+        """Повертає (сторінка результатів, next_offset). Порожній next_offset — сторінок більше немає."""
+        query = fts_query(text)
+        if not query:
+            return [], ""
+        start = int(offset) if offset.isdigit() else 0
+        results = await self._results(query)
+        end = start + self.page_size
+        return results[start:end], str(end) if end < len(results) else ""
+
+    def invalidate(self):
+        self._cache.clear()
@@ -0,0 +1,251 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from aiogram.utils.exceptions import RetryAfter
+
+
+# Пріоритети: менше число — раніше відправляється
+PRIORITY_USER = 0
+PRIORITY_MODERATION = 1
+PRIORITY_BULK = 2
+
+
+# -------------------------------
+# 🔹 Token bucket
+# -------------------------------
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float) -> float:
+        """Скільки секунд зачекати, щоб мати cost токенів (0 — можна вже)."""
+        self._refill()
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        self._refill()
+        self.tokens -= min(cost, self.capacity)
+
+    async def acquire(self, cost: float = 1):
+        while True:
+            wait = self.delay(cost)
+            if wait <= 0:
+                self.take(cost)
+                return
+            await asyncio.sleep(wait)
+
+
+class PriorityBucket(TokenBucket):
+    """
+    Глобальний bucket, який видає токени спершу найпріоритетнішим очікувачам:
+    відповіді користувачам обганяють масову публікацію.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        super().__init__(rate, capacity)
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, cost: float = 1, priority: int = PRIORITY_USER):
+        if not self._waiters and self.delay(cost) <= 0:
+            self.take(cost)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), cost, fut))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await fut
+
+    async def _pump(self):
+        while self._waiters:
+            priority, seq, cost, fut = self._waiters[0]
+            if fut.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            wait = self.delay(cost)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiters)
+            self.take(cost)
+            fut.set_result(None)
+
+
+# -------------------------------
+# 🔹 Черга вихідних повідомлень
+# -------------------------------
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "priority", "cost", "future")
+
+    def __init__(self, fn, args, kwargs, priority, cost, future):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.cost = cost
+        self.future = future
+
+
+class OutboundSender:
+    """
+    Центральна черга всіх вихідних викликів Telegram API.
+    Для кожного чату — своя черга (порядок повідомлень у чаті зберігається)
+    і свій token bucket; поверх — глобальний bucket з пріоритетами.
+    RetryAfter від Telegram призупиняє лише відповідний чат і повторює виклик.
+    """
+
+    def __init__(self, bot, global_rate: float = 30, chat_rate: float = 1,
+                 group_rate_per_min: float = 20, max_retries: int = 3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate_per_min / 60
+        self.max_retries = max_retries
+        self._global = PriorityBucket(global_rate, global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._lanes: dict[int, deque] = {}
+        self._lane_tasks: dict[int, asyncio.Task] = {}
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                # групи/канали: ~20 повідомлень на хвилину, альбом — до 10 одразу
+                bucket = TokenBucket(self.group_rate, 20)
+            else:
+                bucket = TokenBucket(self.chat_rate, 3)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def call(self, chat_id: int, fn, *args, priority: int = PRIORITY_USER, cost: int = 1, **kwargs):
+        """Ставить виклик fn(*args, **kwargs) у чергу чату і чекає на результат."""
+        chat_id = int(chat_id)
+        fut = asyncio.get_running_loop().create_future()
+        self._lanes.setdefault(chat_id, deque()).append(_Job(fn, args, kwargs, priority, cost, fut))
+        task = self._lane_tasks.get(chat_id)
+        if task is None or task.done():
+            self._lane_tasks[chat_id] = asyncio.create_task(self._run_lane(chat_id))
+        return await fut
+
+    async def _run_lane(self, chat_id: int):
+        lane = self._lanes[chat_id]
+        bucket = self._chat_bucket(chat_id)
+        try:
+            while lane:
+                job = lane[0]
+                await self._execute(chat_id, bucket, job)
+                lane.popleft()
+        finally:
+            if not lane:
+                self._lanes.pop(chat_id, None)
+                self._lane_tasks.pop(chat_id, None)
+
+    async def _execute(self, chat_id: int, bucket: TokenBucket, job: _Job):
+        attempt = 0
+        while True:
+            await bucket.acquire(job.cost)
+            await self._global.acquire(job.cost, job.priority)
+            try:
+                result = await job.fn(*job.args, **job.kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                self.retries += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    if not job.future.cancelled():
+                        job.future.set_exception(e)
+                    return
+                logging.warning(f"⏳ Flood control для чату {chat_id}: чекаємо {e.timeout} с (спроба {attempt})")
+                await asyncio.sleep(e.timeout)
+                continue
+            except Exception as e:
+                self.failed += 1
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+                return
+            self.sent += 1
+            if not job.future.cancelled():
+                job.future.set_result(result)
+            return
+
+    # --- зручні обгортки ---
+    async def send_message(self, chat_id, text, priority: int = PRIORITY_USER, **kwargs):
+        return await self.call(chat_id, self.bot.send_message, chat_id, text, priority=priority, **kwargs)
+
+    async def send_photo(self, chat_id, photo, priority: int = PRIORITY_USER, **kwargs):
+        return await self.call(chat_id, self.bot.send_photo, chat_id, photo, priority=priority, **kwargs)
+
+    async def send_media_group(self, chat_id, media, priority: int = PRIORITY_USER, **kwargs):
+        return await self.call(chat_id, self.bot.send_media_group, chat_id, media,
+                               priority=priority, cost=len(media), **kwargs)
+
+    async def reply(self, message, text, priority: int = PRIORITY_USER, quote: bool = False, **kwargs):
+        """Як message.answer() (quote=True — як message.reply()): той самий чат і гілка, але через чергу."""
+        if message.is_topic_message and message.message_thread_id:
+            kwargs.setdefault("message_thread_id", message.message_thread_id)
+        if quote:
+            kwargs.setdefault("reply_to_message_id", message.message_id)
+        return await self.send_message(message.chat.id, text, priority=priority, **kwargs)
+
+    async def edit_text(self, message, text, priority: int = PRIORITY_USER, **kwargs):
+        # chat_id зайнятий параметром call(), тож чат і повідомлення — позиційно
+        return await self.call(message.chat.id, self.bot.edit_message_text, text,
+                               message.chat.id, message.message_id, priority=priority, **kwargs)
+
+    async def edit_reply_markup(self, message, reply_markup=None, priority: int = PRIORITY_USER):
+        return await self.call(message.chat.id, self.bot.edit_message_reply_markup,
+                               message.chat.id, message.message_id,
+                               reply_markup=reply_markup, priority=priority)
+
+    async def answer_callback(self, callback_query, text=None, **kwargs):
+        """
+        Відповідь на натискання кнопки — у черзі чату користувача, після вже
+        поставлених йому повідомлень. Ліміти повідомлень не витрачає (cost=0).
+        """
+        return await self.call(callback_query.from_user.id, self.bot.answer_callback_query,
+                               callback_query.id, text, cost=0, **kwargs)
+
+    # --- моніторинг ---
+    def stats(self) -> dict:
+        by_priority = {"user": 0, "moderation": 0, "bulk": 0}
+        names = {PRIORITY_USER: "user", PRIORITY_MODERATION: "moderation", PRIORITY_BULK: "bulk"}
+        for lane in self._lanes.values():
+            for job in lane:
+                by_priority[names.get(job.priority, "bulk")] += 1
+        return {
+            "queued": sum(by_priority.values()),
+            "queued_by_priority": by_priority,
+            "active_chats": len(self._lanes),
+            "waiting_global": self._global.waiting,
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+    async def drain(self, timeout: float = 10):
+        """Чекає, поки відправляться всі поставлені в чергу повідомлення."""
+        tasks = [t for t in self._lane_tasks.values() if not t.done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
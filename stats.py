@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta, timezone
+
+
+METRICS = ("created", "published", "rejected", "shares")
+GROUP_BY = ("day", "category", "district")
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def window_start(days: int) -> date:
+    """Перший день вікна з days днів разом із сьогоднішнім (7 днів — з today-6)."""
+    return utc_today() - timedelta(days=days - 1)
+
+
+# -------------------------------
+# 🔹 Статистика
+# -------------------------------
+class StatsStore:
+    """
+    Читання щоденних лічильників з ads_daily_stats. Таблицю наповнюють
+    тригери на ads, тож запити залежать від кількості днів, а не оголошень.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def totals(self, since: date | None = None) -> dict:
+        """Суми всіх метрик з дня since (включно) або за весь час."""
+        sql = "SELECT " + ", ".join(f"COALESCE(SUM({m}), 0)" for m in METRICS) + " FROM ads_daily_stats"
+        params = ()
+        if since is not None:
+            sql += " WHERE day >= ?"
+            params = (since.isoformat(),)
+        row = await self.db.fetchone(sql, params)
+        return dict(zip(METRICS, row))
+
+    async def breakdown(self, group_by: str = "category", date_from: date | None = None,
+                        date_to: date | None = None, category: str | None = None,
+                        district: str | None = None) -> list[dict]:
+        """
+        Метрики в розрізі group_by ("day" — часовий ряд, "category", "district")
+        за діапазон днів [date_from, date_to] з необов'язковими фільтрами.
+        """
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Невідоме групування: {group_by}")
+        where, params = [], []
+        if date_from:
+            where.append("day >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            where.append("day <= ?")
+            params.append(date_to.isoformat())
+        if category:
+            where.append("category=?")
+            params.append(category)
+        if district:
+            where.append("district=?")
+            params.append(district)
+
+        sql = f"SELECT {group_by}, " + ", ".join(f"SUM({m})" for m in METRICS) + " FROM ads_daily_stats"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" GROUP BY {group_by} ORDER BY "
+        sql += "day" if group_by == "day" else "SUM(created) DESC"
+        rows = await self.db.fetchall(sql, params)
+        return [{group_by: row[0], **dict(zip(METRICS, row[1:]))} for row in rows]
+
+    async def summary(self) -> dict:
+        """Зведення для /stats: створено за сьогодні / 7 / 30 днів і всього поширень."""
+        today = utc_today()
+
+        def run(cur):
+            return cur.execute("""
+                SELECT
+                    COALESCE(SUM(CASE WHEN day >= ? THEN created END), 0),
+                    COALESCE(SUM(CASE WHEN day >= ? THEN created END), 0),
+                    COALESCE(SUM(CASE WHEN day >= ? THEN created END), 0),
+                    COALESCE(SUM(shares), 0)
+                FROM ads_daily_stats
+            """, (today.isoformat(), window_start(7).isoformat(), window_start(30).isoformat())).fetchone()
+
+        today_count, week_count, month_count, shares = await self.db.read(run)
+        return {"today": today_count, "week": week_count, "month": month_count, "shares": shares}
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from aiogram import Bot, Dispatcher, types
+
+
+# Поля Update, у яких є автор (from_user)
+_USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "my_chat_member", "chat_member", "chat_join_request",
+)
+_CHAT_FIELDS = ("channel_post", "edited_channel_post")
+
+
+def update_user_id(update: types.Update) -> int | None:
+    """Id автора апдейта або None, якщо автора немає."""
+    for field in _USER_FIELDS:
+        obj = getattr(update, field, None)
+        if obj is not None and obj.from_user is not None:
+            return obj.from_user.id
+    return None
+
+
+def update_key(update: types.Update) -> int:
+    """Ключ черги для апдейта: id користувача, інакше id чату, інакше update_id."""
+    user_id = update_user_id(update)
+    if user_id is not None:
+        return user_id
+    for field in _CHAT_FIELDS:
+        obj = getattr(update, field, None)
+        if obj is not None:
+            return obj.chat.id
+    return update.update_id
+
+
+# -------------------------------
+# 🔹 Обробка апдейтів у фоні
+# -------------------------------
+class UpdateWorkers:
+    """
+    Пул воркерів для апдейтів з вебхука. Вебхук лише ставить апдейт у чергу
+    і одразу відповідає Telegram. Апдейти одного користувача завжди потрапляють
+    в одну й ту саму чергу, тож обробляються по порядку (кроки FSM не
+    перемішуються), а різні користувачі обробляються паралельно.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = 8, queue_size: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        # місткість кожної черги; сумарно — приблизно queue_size
+        self.shard_size = max(1, -(-queue_size // workers))
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._idle = asyncio.Event()
+        self._active = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        self._queues = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    def submit(self, update: types.Update) -> bool:
+        """Ставить апдейт у чергу; False — черга переповнена."""
+        queue = self._queues[update_key(update) % self.workers]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        Bot.set_current(self.bot)
+        Dispatcher.set_current(self.dp)
+        while True:
+            update = await queue.get()
+            await self._resumed.wait()
+            self._active += 1
+            try:
+                # через process_updates, щоб спрацювали middleware рівня апдейта
+                await self.dp.process_updates([update])
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logging.exception(f"❌ Помилка обробки апдейту {update.update_id}")
+            finally:
+                self._active -= 1
+                if not self._active:
+                    self._idle.set()
+                queue.task_done()
+
+    @asynccontextmanager
+    async def paused(self):
+        """
+        Воркери не беруть нових апдейтів до кінця блоку, а вхід у блок чекає
+        завершення тих, що вже обробляються. Вебхук тим часом лише ставить
+        апдейти в чергу (при переповненні — 503, і Telegram повторить).
+        """
+        self._resumed.clear()
+        try:
+            while self._active:
+                self._idle.clear()
+                await self._idle.wait()
+            yield
+        finally:
+            self._resumed.set()
+
+    async def close(self, timeout: float = 10):
+        """Дочікується обробки вже прийнятих апдейтів і зупиняє воркери."""
+        if self._queues:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"⏳ Не оброблено апдейтів при зупинці: {self.queue_depth()}")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue_depth(),
+            "max_shard_depth": max((q.qsize() for q in self._queues), default=0),
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,93 @@
+import logging
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from updates import update_user_id
+
+
+# -------------------------------
+# 🔹 Прийняті правила і чорний список
+# -------------------------------
+class UserGate:
+    """
+    Множини користувачів, що погодились із правилами, і заблокованих.
+    Завантажуються один раз на старті; зміни записуються в базу і одразу
+    в пам'ять (write-through), тож перевірки не роблять запитів до БД.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._accepted: set[int] = set()
+        self._blocked: set[int] = set()
+
+    async def load(self):
+        accepted = await self.db.fetchall("SELECT user_id FROM users WHERE accepted_rules")
+        blocked = await self.db.fetchall("SELECT user_id FROM blacklist")
+        self._accepted = {r[0] for r in accepted}
+        self._blocked = {r[0] for r in blocked}
+        logging.info(f"👥 Користувачів з правилами: {len(self._accepted)}, заблокованих: {len(self._blocked)}")
+
+    def accepted(self, user_id: int) -> bool:
+        return user_id in self._accepted
+
+    def blocked(self, user_id: int) -> bool:
+        return user_id in self._blocked
+
+    async def accept(self, user_id: int):
+        await self.db.execute(
+            "INSERT OR REPLACE INTO users (user_id, accepted_rules) VALUES (?, ?)", (user_id, True)
+        )
+        self._accepted.add(user_id)
+
+    async def block(self, user_id: int, username: str | None, first_name: str | None):
+        await self.db.execute(
+            "INSERT OR IGNORE INTO blacklist (user_id, username, first_name) VALUES (?, ?, ?)",
+            (user_id, username, first_name)
+        )
+        self._blocked.add(user_id)
+
+    async def unblock(self, user_id: int):
+        await self.db.execute("DELETE FROM blacklist WHERE user_id=?", (user_id,))
+        self._blocked.discard(user_id)
+
+
+class UserGateMiddleware(BaseMiddleware):
+    """
+    Відкидає апдейти заблокованих користувачів ще до FSM і хендлерів.
+    Апдейти з exempt_chats (адмін-група) не відкидаються. Про блокування
+    користувач дізнається один раз за час роботи бота; натискання кнопок
+    отримують коротку відповідь, щоб не "зависали".
+    """
+
+    def __init__(self, gate: UserGate, sender, exempt_chats=()):
+        super().__init__()
+        self.gate = gate
+        self.sender = sender
+        self.exempt_chats = set(exempt_chats)
+        self._notified: set[int] = set()
+        self.dropped = 0
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        user_id = update_user_id(update)
+        if user_id is None or not self.gate.blocked(user_id):
+            return
+
+        message = update.message or update.edited_message
+        callback = update.callback_query
+        chat = message.chat if message else (callback.message.chat if callback and callback.message else None)
+        if chat is not None and chat.id in self.exempt_chats:
+            return
+
+        self.dropped += 1
+        if callback is not None:
+            await self.sender.answer_callback(callback, "🚫 Ви заблоковані")
+        elif message is not None and chat.type == types.ChatType.PRIVATE and user_id not in self._notified:
+            self._notified.add(user_id)
+            await self.sender.send_message(user_id, "🚫 Ви заблоковані та не можете користуватися ботом.")
+        raise CancelHandler()
+
+    def forget(self, user_id: int):
+        """Після розблокування — наступне блокування знову повідомить користувача."""
+        self._notified.discard(user_id)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+
+# -------------------------------
+# 🔹 Відкладений запис у базу
+# -------------------------------
+class WriteBehind:
+    """
+    Спільний цикл відкладеного запису: зміни накопичуються в пам'яті,
+    а flush() зберігає їх раз на flush_interval секунд і при закритті.
+    Підклас реалізує лише _flush(): бере накопичене і пише однією
+    транзакцією, а якщо запис не вдався — повертає взяте назад, щоб
+    зберегти його при наступному flush().
+    """
+
+    flush_error = "❌ Не вдалося зберегти відкладені зміни"
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    def _start_flushing(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception(self.flush_error)
+
+    async def flush(self):
+        # збереження не перетинаються між собою
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def paused(self):
+        """На час блоку збереження не виконуються (наприклад, поки відновлюється база)."""
+        async with self._flush_lock:
+            yield